@@ -1,10 +1,10 @@
-import pandas as pd
 import logging
 from logging.handlers import RotatingFileHandler
-from flask import Flask, send_from_directory
+from flask import Flask, Response, send_from_directory, stream_with_context
 from flask import request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+import click
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from flask_login import (
@@ -16,16 +16,32 @@ from flask_login import (
     current_user,
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-from reportlab.pdfgen import canvas
 from functools import wraps
-from sqlalchemy import or_, and_
+from contextlib import contextmanager
+from sqlalchemy import MetaData, Table, or_, and_, func, case, delete, inspect, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased
-import calendar
 from collections import defaultdict
-import heapq
-import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import time
 from dotenv import load_dotenv
 import os
+import hashlib
+import hmac
+import base64
+import json
+from availability import AvailabilityCalendar, encode_availability, month_day_bit, month_start, parse_availability_payload, weekday_bit
+from pairing import PAIRING_MODES, SOLVERS, PairRecency, SchedulingState, plan_week, preview_candidate
+from instrumentation import Instrumentation, QueryCounter
+from database import REPLICA_BIND, RoutingSession, engine_options, replica_binds, replica_reads
+from cache import make_cache
+from search import AgentSearchIndex
+from export import EXPORT_FORMATS, stream_export
+from jobs import JobQueue, job_payload
+from locks import NamedLocks
 
 if os.environ.get("FLASK_ENV") == "development":
     load_dotenv()
@@ -40,7 +56,63 @@ else:
 
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URI")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
+# Connection pool per worker process; size it so workers * (size + overflow) stays under max_connections
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 5))
+app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+app.config["DB_POOL_TIMEOUT"] = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+# Recycle well before the server's wait_timeout closes idle connections
+app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+app.config["DB_POOL_PRE_PING"] = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# LIFO reuses the same few connections and lets the rest go idle and get recycled
+app.config["DB_POOL_USE_LIFO"] = os.environ.get("DB_POOL_USE_LIFO", "").lower() in ("1", "true", "yes")
+app.config["DB_ISOLATION_LEVEL"] = os.environ.get("DB_ISOLATION_LEVEL")  # e.g. "READ COMMITTED"
+app.config["DB_CONNECT_TIMEOUT"] = int(os.environ.get("DB_CONNECT_TIMEOUT", 10))
+app.config["DB_STATEMENT_TIMEOUT_MS"] = int(os.environ["DB_STATEMENT_TIMEOUT_MS"]) if os.environ.get("DB_STATEMENT_TIMEOUT_MS") else None
+# Read-only GET endpoints marked @replica_reads send their SELECTs here when set
+app.config["DATABASE_REPLICA_URI"] = os.environ.get("DATABASE_REPLICA_URI")
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+app.config["SQLALCHEMY_BINDS"] = replica_binds(app.config)
+# Pairing solver: "greedy" (default), "blossom" or "weighted", see pairing.solve_pairing
+app.config["PAIRING_SOLVER"] = os.environ.get("PAIRING_SOLVER", "greedy")
+app.config["PAIRING_TIME_BUDGET"] = float(os.environ["PAIRING_TIME_BUDGET"]) if os.environ.get("PAIRING_TIME_BUDGET") else None
+# "window" (default) never repeats a pairing within PAIRING_WINDOW_MONTHS of a week; "recency"
+# prefers the pairs that met longest ago instead, see pairing.plan_week
+app.config["PAIRING_MODE"] = os.environ.get("PAIRING_MODE", "window")
+app.config["PAIRING_WINDOW_MONTHS"] = int(os.environ.get("PAIRING_WINDOW_MONTHS", 6))
+# Compare every incremental candidate graph update against a full rebuild (slow, for debugging)
+app.config["CANDIDATE_GRAPH_CHECK"] = os.environ.get("CANDIDATE_GRAPH_CHECK", "").lower() in ("1", "true", "yes")
+# "memory" (per worker LRU) or a redis:// URL shared by all workers
+app.config["SCHEDULE_CACHE_URL"] = os.environ.get("SCHEDULE_CACHE_URL", "memory")
+app.config["SCHEDULE_CACHE_SIZE"] = int(os.environ.get("SCHEDULE_CACHE_SIZE", 256))
+# Seconds before a worker reloads its agent search index to pick up other workers' edits
+app.config["AGENT_SEARCH_REFRESH"] = float(os.environ.get("AGENT_SEARCH_REFRESH", 300))
+# Per-request SQL counts, phase timings, Server-Timing headers and /api/metrics
+app.config["INSTRUMENTATION"] = os.environ.get("INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+# When set, /api/metrics requires "Authorization: Bearer <token>"
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+# Threads per worker process running queued schedule generation jobs
+app.config["SCHEDULE_JOB_WORKERS"] = int(os.environ.get("SCHEDULE_JOB_WORKERS", 2))
+# A queued or running job older than this is taken to be abandoned by a dead worker
+app.config["SCHEDULE_JOB_STALE_SECONDS"] = float(os.environ.get("SCHEDULE_JOB_STALE_SECONDS", 1800))
+# Seconds to wait for another worker generating or saving the same week
+app.config["SCHEDULE_LOCK_TIMEOUT"] = float(os.environ.get("SCHEDULE_LOCK_TIMEOUT", 120))
+# Processes computing /api/schedule/preview candidates in parallel, 0 computes them in the request
+app.config["PREVIEW_WORKERS"] = int(os.environ.get("PREVIEW_WORKERS", min(4, os.cpu_count() or 1)))
+app.config["LOG_MAX_BYTES"] = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+db = SQLAlchemy(app, session_options={"class_": RoutingSession})
+
+schedule_cache = make_cache(app.config["SCHEDULE_CACHE_URL"], "schedule", app.config["SCHEDULE_CACHE_SIZE"])
+# Keys carry the roster and availability versions, so entries for older versions only need to age out
+roster_cache = make_cache(app.config["SCHEDULE_CACHE_URL"], "roster", app.config["SCHEDULE_CACHE_SIZE"], ttl=24 * 60 * 60)
+
+instrumentation = Instrumentation(app.config["INSTRUMENTATION"])
+with app.app_context():
+    engines = {"primary": db.engine}
+    if REPLICA_BIND in db.engines:
+        engines["replica"] = db.engines[REPLICA_BIND]
+    instrumentation.init_app(app, engines)
+    # Before any request thread runs queries, see QueryCounter
+    QueryCounter.instrument(db.engine)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -54,7 +126,7 @@ else:
     logging.basicConfig(level=logging.INFO)
 
 logger = logging.getLogger(__name__)
-handler = RotatingFileHandler("app.log", maxBytes=10000, backupCount=1)
+handler = RotatingFileHandler("app.log", maxBytes=app.config["LOG_MAX_BYTES"], backupCount=3)
 handler.setLevel(logging.INFO)
 logger.addHandler(handler)
 
@@ -143,6 +215,81 @@ class Agent(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    __table_args__ = (
+        db.Index("ix_agents_name", "last_name", "first_name", "agent_id"),
+        db.Index("ix_agents_first_name", "first_name"),
+    )
+
+
+# "First Last" -> agent_id for set_schedule, valid for the roster version in
+# _agent_id_cache_version. Agent create/rename/delete in this process also clear it.
+_agent_id_cache = {}
+_agent_id_cache_version = None
+_agent_id_cache_lock = threading.Lock()
+
+
+def invalidate_agent_id_cache():
+    with _agent_id_cache_lock:
+        _agent_id_cache.clear()
+
+
+def resolve_agent_ids(names):
+    """Map "First Last" names to agent_ids with at most two queries. Unknown names are left out.
+
+    Renames and deletes in any worker bump the roster version, which empties this
+    worker's cache on its next call.
+    """
+    global _agent_id_cache_version
+    version = cache_version(ROSTER_VERSION)
+    resolved = {}
+    missing = {}
+    with _agent_id_cache_lock:
+        if version != _agent_id_cache_version:
+            _agent_id_cache.clear()
+            _agent_id_cache_version = version
+        for name in set(names):
+            agent_id = _agent_id_cache.get(name)
+            if agent_id is not None:
+                resolved[name] = agent_id
+                continue
+            parts = name.split(" ")
+            if len(parts) == 2:
+                missing[tuple(parts)] = name
+
+    if missing:
+        rows = db.session.query(Agent.first_name, Agent.last_name, Agent.agent_id).filter(
+            tuple_(Agent.first_name, Agent.last_name).in_(list(missing))
+        )
+        with _agent_id_cache_lock:
+            for first_name, last_name, agent_id in rows:
+                name = missing.get((first_name, last_name))
+                # The database collation may match names that differ in case
+                if name is not None:
+                    resolved[name] = agent_id
+                    # Unless another call already moved the cache on to a newer version
+                    if _agent_id_cache_version == version:
+                        _agent_id_cache[name] = agent_id
+    return resolved
+
+
+# Per worker search index over the roster. Agent create/update/delete in this
+# process keep it in sync; AGENT_SEARCH_REFRESH bounds staleness across workers.
+agent_search_index = AgentSearchIndex()
+_agent_search_build_lock = threading.Lock()
+
+
+def agent_search_row(agent):
+    return {field: getattr(agent, field) for field in AGENT_FIELDS}
+
+
+def get_agent_search_index():
+    if agent_search_index.is_stale(app.config["AGENT_SEARCH_REFRESH"]):
+        with _agent_search_build_lock:
+            if agent_search_index.is_stale(app.config["AGENT_SEARCH_REFRESH"]):
+                rows = db.session.query(*(getattr(Agent, field) for field in AGENT_FIELDS))
+                agent_search_index.rebuild(agent_search_row(row) for row in rows)
+    return agent_search_index
+
 
 @app.route("/api/agents/create", methods=["POST"])
 @login_required
@@ -174,7 +321,10 @@ def create_agent():
         db.session.add(new_agent)
         db.session.flush()
         agent_id = new_agent.agent_id
+        bump_cache_version(ROSTER_VERSION)
         db.session.commit()
+        invalidate_agent_id_cache()
+        agent_search_index.upsert(agent_search_row(new_agent))
         return jsonify({"message": "New agent created", "agent_id": agent_id}), 201
     except Exception as e:
         db.session.rollback()
@@ -182,32 +332,113 @@ def create_agent():
         return jsonify({"message": "Failed to create agent"}), 500
 
 
+AGENT_FIELDS = ("agent_id", "first_name", "last_name", "email", "phone_number", "active_status")
+# Columns the roster is ordered by; keyset cursors encode their values for the last row of a page
+AGENT_SORT_KEY = ("last_name", "first_name", "agent_id")
+MAX_AGENT_PAGE_SIZE = 500
+
+
+def encode_agent_cursor(row):
+    key = json.dumps([row.last_name, row.first_name, row.agent_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_agent_cursor(cursor):
+    last_name, first_name, agent_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return last_name, first_name, int(agent_id)
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 @app.route("/api/agents/get", methods=["GET"])
 @login_required
+@replica_reads
 def get_agents():
-    agents = Agent.query
+    # Without a limit the full roster is returned as a plain list, as before.
+    # With ?limit=N the response is {"agents": [...], "next_cursor": ...} and
+    # the next page is requested with ?cursor=<next_cursor>.
+    fields = request.args.get("fields")
+    fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(AGENT_FIELDS)
+    unknown = [field for field in fields if field not in AGENT_FIELDS]
+    if unknown:
+        return jsonify({"message": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    search_mode = request.args.get("search_mode", "contains")
+    if search_mode not in ("contains", "prefix"):
+        return jsonify({"message": "search_mode must be 'contains' or 'prefix'"}), 400
+
+    limit = request.args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= MAX_AGENT_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_AGENT_PAGE_SIZE}"}), 400
+
+    # Select plain columns rather than Agent instances; the sort key is always
+    # fetched so the cursor can be built even when it isn't projected.
+    columns = list(dict.fromkeys(fields + list(AGENT_SORT_KEY)))
+    agents = db.session.query(*(getattr(Agent, column) for column in columns))
+
     search = request.args.get("search")
     if search:
+        if search_mode == "prefix":
+            # Anchored patterns can use ix_agents_name / ix_agents_first_name / the email index
+            pattern = f"{escape_like(search)}%"
+            agents = agents.filter(
+                Agent.last_name.like(pattern, escape="\\")
+                | Agent.first_name.like(pattern, escape="\\")
+                | Agent.email.like(pattern, escape="\\")
+            )
+        else:
+            agents = agents.filter(
+                (Agent.first_name.ilike(f"%{search}%"))
+                | (Agent.last_name.ilike(f"%{search}%"))
+                | ((Agent.email != None) & (Agent.email.ilike(f"%{search}%")))
+            )
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            last_name, first_name, agent_id = decode_agent_cursor(cursor)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid cursor"}), 400
+        # Expanded form of (last_name, first_name, agent_id) > cursor so the
+        # optimizer can seek into ix_agents_name
         agents = agents.filter(
-            (Agent.first_name.ilike(f"%{search}%"))
-            | (Agent.last_name.ilike(f"%{search}%"))
-            | ((Agent.email != None) & (Agent.email.ilike(f"%{search}%")))
+            (Agent.last_name > last_name)
+            | (
+                (Agent.last_name == last_name)
+                & ((Agent.first_name > first_name) | ((Agent.first_name == first_name) & (Agent.agent_id > agent_id)))
+            )
         )
-    agents = agents.order_by(Agent.last_name.asc(), Agent.first_name.asc()).all()
 
-    agents_data = []
-    for agent in agents:
-        agents_data.append(
-            {
-                "agent_id": agent.agent_id,
-                "first_name": agent.first_name,
-                "last_name": agent.last_name,
-                "email": agent.email,
-                "phone_number": agent.phone_number,
-                "active_status": agent.active_status
-            }
-        )
-    return jsonify(agents_data)
+    agents = agents.order_by(Agent.last_name.asc(), Agent.first_name.asc(), Agent.agent_id.asc())
+    if limit is None:
+        return jsonify([{field: getattr(row, field) for field in fields} for row in agents])
+
+    rows = agents.limit(limit + 1).all()
+    page = rows[:limit]
+    next_cursor = encode_agent_cursor(page[-1]) if len(rows) > limit else None
+    return jsonify(
+        {
+            "agents": [{field: getattr(row, field) for field in fields} for row in page],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@app.route("/api/agents/search", methods=["GET"])
+@login_required
+@replica_reads
+def search_agents():
+    # Ranked, typo tolerant search served from memory; /api/agents/get?search= still queries the database
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", 20, type=int)
+    if not 1 <= limit <= MAX_AGENT_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_AGENT_PAGE_SIZE}"}), 400
+    active_only = request.args.get("active_only", "").lower() in ("1", "true", "yes")
+
+    results = get_agent_search_index().search(query, limit=limit, active_only=active_only)
+    return jsonify([dict(agent, score=score) for agent, score in results])
 
 
 @app.route("/api/agents/update/<int:agent_id>", methods=["PUT"])
@@ -237,12 +468,24 @@ def update_agent(agent_id):
         if existing_agent:
             return jsonify({"message": "An agent with the same first and last name already exists"}), 400
 
+        renamed = (new_first_name, new_last_name) != (agent.first_name, agent.last_name)
+        new_active_status = data.get("active_status", agent.active_status)
+        # Schedules and name lookups only depend on names, the roster grid on active status
+        if renamed:
+            bump_cache_version(ROSTER_VERSION)
+        if new_active_status != agent.active_status:
+            bump_cache_version(AVAILABILITY_VERSION)
+
         agent.first_name = new_first_name
         agent.last_name = new_last_name
         agent.email = data.get("email", agent.email)
         agent.phone_number = data.get("phone_number", agent.phone_number)
-        agent.active_status = data.get("active_status", agent.active_status)
+        agent.active_status = new_active_status
         db.session.commit()
+        if renamed:
+            invalidate_agent_id_cache()
+            invalidate_schedule_cache()
+        agent_search_index.upsert(agent_search_row(agent))
         return jsonify({"message": "Agent updated"})
     except Exception as e:
         db.session.rollback()
@@ -250,47 +493,78 @@ def update_agent(agent_id):
         return jsonify({"message": "Failed to update agent"}), 500
 
 
+def delete_agents(agent_ids):
+    """Delete agents and everything that refers to them with one statement per table.
+
+    Paired schedule_details keep the remaining partner as an unpaired agent1;
+    details left with no agent are removed. Runs in the caller's transaction and
+    returns [(step, rowcount, ms)] in execution order.
+    """
+    agent_ids = list(agent_ids)
+    bump_cache_version(ROSTER_VERSION)
+    detail_has_agent = or_(ScheduleDetail.agent1_id.in_(agent_ids), ScheduleDetail.agent2_id.in_(agent_ids))
+    steps = [
+        ("weekly_availability", delete(WeeklyAvailability).where(WeeklyAvailability.agent_id.in_(agent_ids))),
+        ("availability_overrides", delete(AvailabilityOverride).where(AvailabilityOverride.agent_id.in_(agent_ids))),
+        (
+            "unpair_schedule_details",
+            # MySQL applies SET clauses left to right, so agent1_id must read agent2_id before it is cleared
+            update(ScheduleDetail)
+            .where(detail_has_agent, ScheduleDetail.is_paired == True)
+            .ordered_values(
+                (
+                    ScheduleDetail.agent1_id,
+                    case((ScheduleDetail.agent1_id.in_(agent_ids), ScheduleDetail.agent2_id), else_=ScheduleDetail.agent1_id),
+                ),
+                (ScheduleDetail.agent2_id, None),
+                (ScheduleDetail.is_paired, False),
+            ),
+        ),
+        (
+            "schedule_details",
+            delete(ScheduleDetail)
+            .where(
+                or_(
+                    and_(ScheduleDetail.agent1_id.in_(agent_ids), ScheduleDetail.agent2_id == None),
+                    and_(ScheduleDetail.agent2_id.in_(agent_ids), ScheduleDetail.agent1_id == None),
+                ),
+                ScheduleDetail.is_paired == False,
+            ),
+        ),
+        ("blacklist", delete(Blacklist).where(or_(Blacklist.agent1_id.in_(agent_ids), Blacklist.agent2_id.in_(agent_ids)))),
+        (
+            "pairing_history",
+            delete(PairingHistory).where(or_(PairingHistory.agent1_id.in_(agent_ids), PairingHistory.agent2_id.in_(agent_ids))),
+        ),
+        ("agents", delete(Agent).where(Agent.agent_id.in_(agent_ids))),
+    ]
+
+    timings = []
+    for step, statement in steps:
+        started = time.perf_counter()
+        # Nothing in the session refers to these rows, so skip ORM session synchronization
+        result = db.session.execute(statement.execution_options(synchronize_session=False))
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        logger.info(f"Delete agents {step}: {result.rowcount} rows in {elapsed_ms} ms")
+        timings.append((step, result.rowcount, elapsed_ms))
+    return timings
+
+
+def agents_deleted(agent_ids):
+    invalidate_agent_id_cache()
+    invalidate_schedule_cache()
+    for agent_id in agent_ids:
+        agent_search_index.remove(agent_id)
+
+
 @app.route("/api/agents/delete/<int:agent_id>", methods=["DELETE"])
 @login_required
 def delete_agent(agent_id):
-    agent = Agent.query.get_or_404(agent_id)
+    Agent.query.get_or_404(agent_id)
     try:
-        RecurringAvailability.query.filter_by(agent_id=agent_id).delete()
-        Availability.query.filter_by(agent_id=agent_id).delete()
-
-        # Identify ScheduleDetails where the agent is a part of a pair
-        paired_details = ScheduleDetail.query.filter(
-            or_(
-                ScheduleDetail.agent1_id == agent_id,
-                ScheduleDetail.agent2_id == agent_id,
-            ),
-            ScheduleDetail.is_paired == True
-        ).all()
-
-        # Update ScheduleDetails to unpair and clear the appropriate agent_id
-        for detail in paired_details:
-            if detail.agent1_id != agent_id:
-                # If the deleted agent is agent2, clear agent2 and unpair
-                detail.agent2_id = None
-            else:
-                # If the deleted agent is agent1, move agent2 to agent1, clear agent2, and unpair
-                detail.agent1_id = detail.agent2_id
-                detail.agent2_id = None
-            detail.is_paired = False
-
-        ScheduleDetail.query.filter(
-            db.or_(
-                db.and_(ScheduleDetail.agent1_id == agent_id, ScheduleDetail.agent2_id == None),
-                db.and_(ScheduleDetail.agent2_id == agent_id, ScheduleDetail.agent1_id == None)
-            ),
-            ScheduleDetail.is_paired == False
-        ).delete()
-
-        Blacklist.query.filter(
-            or_(Blacklist.agent1_id == agent_id, Blacklist.agent2_id == agent_id)
-        ).delete()
-        db.session.delete(agent)
+        delete_agents([agent_id])
         db.session.commit()
+        agents_deleted([agent_id])
         return jsonify({"message": "Agent and related data deleted"})
     except Exception as e:
         db.session.rollback()
@@ -298,53 +572,131 @@ def delete_agent(agent_id):
         return jsonify({"message": "Failed to delete agent and related data"}), 500
 
 
-class RecurringAvailability(db.Model):
-    __tablename__ = "recurring_availability"
-    id = db.Column(db.Integer, primary_key=True)
-    agent_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"))
-    day_of_week = db.Column(db.Integer)
-    is_available = db.Column(db.Boolean)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+@app.route("/api/agents/bulk_delete", methods=["DELETE"])
+@login_required
+def bulk_delete_agents():
+    # {"agent_ids": [1, 2, ...]}
+    data = request.get_json(silent=True) or {}
+    try:
+        agent_ids = sorted({int(agent_id) for agent_id in data.get("agent_ids")})
+    except (TypeError, ValueError):
+        return jsonify({"message": "agent_ids must be a list of ids"}), 400
+    if not agent_ids:
+        return jsonify({"message": "agent_ids must be a non-empty list"}), 400
+
+    known_ids = {agent_id for (agent_id,) in db.session.query(Agent.agent_id).filter(Agent.agent_id.in_(agent_ids))}
+    unknown_ids = sorted(set(agent_ids) - known_ids)
+    if unknown_ids:
+        return jsonify({"message": "Unknown agent ids", "agent_ids": unknown_ids}), 400
+
+    try:
+        timings = delete_agents(agent_ids)
+        db.session.commit()
+        agents_deleted(agent_ids)
+        return jsonify(
+            {
+                "message": f"Deleted {len(agent_ids)} agents and related data",
+                "steps": [{"step": step, "rows": rows, "ms": ms} for step, rows, ms in timings],
+            }
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error bulk deleting agents: {str(e)}")
+        return jsonify({"message": "Failed to delete agents and related data"}), 500
+
+
+class WeeklyAvailability(db.Model):
+    # Recurring availability, bit n of day_mask is set when available on day number n (Sunday is 0)
+    __tablename__ = "weekly_availability"
+    agent_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"), primary_key=True)
+    day_mask = db.Column(db.SmallInteger, nullable=False, default=0)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
 
-class Availability(db.Model):
-    __tablename__ = "availability"
-    availability_id = db.Column(db.Integer, primary_key=True)
-    agent_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"))
-    date = db.Column(db.Date)
-    is_available = db.Column(db.Boolean)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+class AvailabilityOverride(db.Model):
+    # Specific dates of one agent in one month: bit d - 1 of override_mask marks day d as
+    # overridden and the same bit of available_mask says whether the agent is available
+    __tablename__ = "availability_overrides"
+    __table_args__ = (db.Index("ix_availability_overrides_month", "month", "agent_id"),)
+    agent_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    override_mask = db.Column(db.Integer, nullable=False, default=0)
+    available_mask = db.Column(db.Integer, nullable=False, default=0)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
 
+def load_availability_calendar(agent_ids=None, start_date=None, end_date=None):
+    """AvailabilityCalendar for agent_ids (all agents when None) covering [start_date, end_date).
+
+    Two queries: the weekly masks and the override rows of the months in range.
+    """
+    masks = db.session.query(WeeklyAvailability.agent_id, WeeklyAvailability.day_mask)
+    overrides = db.session.query(
+        AvailabilityOverride.agent_id, AvailabilityOverride.month, AvailabilityOverride.override_mask, AvailabilityOverride.available_mask
+    )
+    if agent_ids is not None:
+        agent_ids = list(agent_ids)
+        masks = masks.filter(WeeklyAvailability.agent_id.in_(agent_ids))
+        overrides = overrides.filter(AvailabilityOverride.agent_id.in_(agent_ids))
+    if start_date is not None:
+        overrides = overrides.filter(AvailabilityOverride.month >= month_start(start_date))
+    if end_date is not None:
+        overrides = overrides.filter(AvailabilityOverride.month < end_date)
+    return AvailabilityCalendar(masks, overrides)
+
+
+def agent_available_on(agent_id, dates):
+    """{date: is_available} for one agent on the given dates."""
+    dates = list(dates)
+    if not dates:
+        return {}
+    availability = load_availability_calendar([agent_id], min(dates), max(dates) + timedelta(days=1))
+    return availability.available_on(agent_id, dates)
+
+
+def available_agent_ids(day, active_only=True):
+    """Ids of the agents available on day, resolved by the database in one query."""
+    override_bit = month_day_bit(day)
+    overridden = func.coalesce(AvailabilityOverride.override_mask, 0).op("&")(override_bit) != 0
+    query = (
+        db.session.query(Agent.agent_id)
+        .outerjoin(WeeklyAvailability, WeeklyAvailability.agent_id == Agent.agent_id)
+        .outerjoin(
+            AvailabilityOverride,
+            and_(AvailabilityOverride.agent_id == Agent.agent_id, AvailabilityOverride.month == month_start(day)),
+        )
+        .filter(
+            or_(
+                and_(overridden, AvailabilityOverride.available_mask.op("&")(override_bit) != 0),
+                and_(~overridden, func.coalesce(WeeklyAvailability.day_mask, 0).op("&")(weekday_bit(day)) != 0),
+            )
+        )
+        .order_by(Agent.agent_id)
+    )
+    if active_only:
+        query = query.filter(Agent.active_status == True)
+    return [agent_id for (agent_id,) in query]
+
+
 @app.route("/api/agents/<int:agent_id>/availability", methods=["GET"])
 @login_required
+@replica_reads
 def get_agent_availability(agent_id):
     try:
         agent = Agent.query.get_or_404(agent_id)
 
-        weekly_availability = RecurringAvailability.query.filter_by(
-            agent_id=agent_id
-        ).all()
-        weekdays = {
-            day: is_available for day, is_available in enumerate(calendar.day_name)
-        }
-        weekly_data = {
-            "weekdays": [
-                av.day_of_week for av in weekly_availability if av.is_available
-            ]
-        }
+        availability = load_availability_calendar([agent_id])
+        day_mask = availability.weekly_masks.get(agent_id, 0)
+        weekly_data = {"weekdays": [day for day in range(7) if day_mask >> day & 1]}
 
-        specific_dates = Availability.query.filter_by(agent_id=agent_id).all()
         specific_dates_data = defaultdict(list)
-        for av in specific_dates:
-            year_month_key = f"{av.date.year}-{av.date.month-1}"
-            specific_dates_data[year_month_key].append(av.date.day)
+        for specific_date in availability.specific_dates(agent_id):
+            year_month_key = f"{specific_date.year}-{specific_date.month-1}"
+            specific_dates_data[year_month_key].append(specific_date.day)
 
         return jsonify(
             {
@@ -358,42 +710,207 @@ def get_agent_availability(agent_id):
         return jsonify({"message": "Failed to fetch availability data"}), 500
 
 
-@app.route("/api/agents/availability/update/<int:agent_id>", methods=["PUT"])
+# Most dates one availability check may ask about
+MAX_AVAILABILITY_DATES = 366
+
+
+@app.route("/api/agents/<int:agent_id>/availability/check", methods=["GET"])
 @login_required
-def update_availability(agent_id):
+@replica_reads
+def check_agent_availability(agent_id):
+    # ?dates=2024-03-04,2024-03-05 -> {"dates": {"2024-03-04": true, ...}}
     try:
-        data = request.json
+        dates = [datetime.strptime(value, "%Y-%m-%d").date() for value in request.args.get("dates", "").split(",") if value]
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+    if not 1 <= len(dates) <= MAX_AVAILABILITY_DATES:
+        return jsonify({"error": f"dates must list between 1 and {MAX_AVAILABILITY_DATES} dates"}), 400
+    Agent.query.get_or_404(agent_id)
 
-        Availability.query.filter_by(agent_id=agent_id).delete()
-        RecurringAvailability.query.filter_by(agent_id=agent_id).delete()
-        # Update weekly availability
-        for day in range(7):
-            is_available = day in data["weeklyAvailability"]
-            db.session.add(
-                RecurringAvailability(
-                    agent_id=agent_id, day_of_week=str(day), is_available=is_available
-                )
-            )
+    available = agent_available_on(agent_id, dates)
+    return jsonify({"agent_id": agent_id, "dates": {day.isoformat(): is_available for day, is_available in available.items()}})
 
-        # Update specific dates availability
-        for year_month, days in data["specificDates"].items():
-            year, month = map(int, year_month.split("-"))
-            for day in days:
-                date = datetime(year, month + 1, day).date()
-
-                weekday = (date.weekday() + 1) % 7
-                usual_availability = RecurringAvailability.query.filter_by(
-                    agent_id=agent_id, day_of_week=str(weekday)
-                ).first()
-                is_available = (
-                    not usual_availability.is_available if usual_availability else True
-                )
-                new_availability = Availability(
-                    agent_id=agent_id, date=date, is_available=is_available
-                )
-                db.session.add(new_availability)
 
+@app.route("/api/availability/available", methods=["GET"])
+@login_required
+@replica_reads
+def get_available_agents():
+    try:
+        day = datetime.strptime(request.args.get("date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "date is required. Use YYYY-MM-DD."}), 400
+    active_only = request.args.get("active_only", "true").lower() not in ("0", "false", "no")
+    return jsonify({"date": day.isoformat(), "agent_ids": available_agent_ids(day, active_only)})
+
+
+class CacheVersion(db.Model):
+    # Bumped in the same transaction as the data a cache is built from, so every
+    # worker sees the change on its next read even with per-process caches
+    __tablename__ = "cache_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Covers which agents exist and their names, see resolve_agent_ids and get_schedule
+ROSTER_VERSION = "roster"
+# Covers availability and active status; roster_weeks keys on both versions
+AVAILABILITY_VERSION = "availability"
+# Longest range one /api/availability/roster call may cover
+MAX_ROSTER_DAYS = 92
+
+
+def bump_cache_version(name):
+    # Runs in the caller's transaction
+    result = db.session.execute(update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1))
+    if result.rowcount == 0:
+        db.session.execute(insert(CacheVersion).values(name=name, version=1))
+
+
+def cache_version(name):
+    return db.session.query(CacheVersion.version).filter_by(name=name).scalar() or 0
+
+
+def cache_versions(*names):
+    # Several versions in one query, in the order given
+    stored = dict(db.session.query(CacheVersion.name, CacheVersion.version).filter(CacheVersion.name.in_(names)))
+    return tuple(stored.get(name, 0) for name in names)
+
+
+def roster_weeks(mondays, version):
+    """{monday: {"agent_ids": [...], "days": ["0110010", ...]}} for active agents, Monday first.
+
+    Weeks come from roster_cache when present; the rest are resolved together
+    from one availability load.
+    """
+    weeks = {}
+    missing = []
+    for monday_date in mondays:
+        cached = roster_cache.get(f"{version}:{monday_date.isoformat()}")
+        if cached is None:
+            missing.append(monday_date)
+        else:
+            weeks[monday_date] = cached
+    if missing:
+        agent_ids = [agent_id for (agent_id,) in db.session.query(Agent.agent_id).filter_by(active_status=True).order_by(Agent.agent_id)]
+        availability = load_availability_calendar(agent_ids, min(missing), max(missing) + timedelta(days=7))
+        for monday_date in missing:
+            matrix = availability.week(monday_date, agent_ids).matrix
+            week = {"agent_ids": agent_ids, "days": ["".join("1" if available else "0" for available in row) for row in matrix.tolist()]}
+            roster_cache.set(f"{version}:{monday_date.isoformat()}", week)
+            weeks[monday_date] = week
+    return weeks
+
+
+@app.route("/api/availability/roster", methods=["GET"])
+@login_required
+@replica_reads
+def get_availability_roster():
+    # {"start", "end", "agent_ids": [...], "availability": ["1011...", ...]}: one string per agent,
+    # character i is "1" when the agent is available on start + i days (end inclusive)
+    try:
+        start_date = datetime.strptime(request.args.get("start", ""), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get("end", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start and end are required. Use YYYY-MM-DD."}), 400
+    day_count = (end_date - start_date).days + 1
+    if not 1 <= day_count <= MAX_ROSTER_DAYS:
+        return jsonify({"error": f"The range must cover between 1 and {MAX_ROSTER_DAYS} days"}), 400
+
+    first_monday = start_date - timedelta(days=start_date.weekday())
+    mondays = [first_monday + timedelta(weeks=week) for week in range((end_date - first_monday).days // 7 + 1)]
+    version = ".".join(str(version) for version in cache_versions(ROSTER_VERSION, AVAILABILITY_VERSION))
+    weeks = roster_weeks(mondays, version)
+
+    # Weeks cached under one version share the agent list, but keep ids aligned per week regardless
+    rows = defaultdict(lambda: ["0"] * (len(mondays) * 7))
+    for week_number, monday_date in enumerate(mondays):
+        week = weeks[monday_date]
+        for agent_id, days in zip(week["agent_ids"], week["days"]):
+            rows[agent_id][week_number * 7 : week_number * 7 + 7] = days
+    offset = start_date.weekday()
+    agent_ids = sorted(rows)
+
+    response = jsonify(
+        {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "agent_ids": agent_ids,
+            "availability": ["".join(rows[agent_id][offset : offset + day_count]) for agent_id in agent_ids],
+        }
+    )
+    response.set_etag(hashlib.sha1(f"{version}:{start_date}:{end_date}".encode()).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def apply_availability_updates(updates):
+    # Diff {agent_id: (recurring, specific)} from parse_availability_payload against the
+    # stored masks and only write what changed: one read per table, then bulk writes
+    agent_ids = list(updates)
+    encoded = {agent_id: encode_availability(*update) for agent_id, update in updates.items()}
+    changes = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    stored_masks = dict(
+        db.session.query(WeeklyAvailability.agent_id, WeeklyAvailability.day_mask).filter(WeeklyAvailability.agent_id.in_(agent_ids))
+    )
+    mask_updates = [
+        {"agent_id": agent_id, "day_mask": day_mask}
+        for agent_id, (day_mask, _) in encoded.items()
+        if agent_id in stored_masks and stored_masks[agent_id] != day_mask
+    ]
+    mask_inserts = [{"agent_id": agent_id, "day_mask": day_mask} for agent_id, (day_mask, _) in encoded.items() if agent_id not in stored_masks]
+    if mask_updates:
+        db.session.execute(update(WeeklyAvailability), mask_updates)
+    if mask_inserts:
+        db.session.execute(insert(WeeklyAvailability), mask_inserts)
+
+    wanted = {(agent_id, month): masks for agent_id, (_, months) in encoded.items() for month, masks in months.items()}
+    stored = {
+        (agent_id, month): (override_mask, available_mask)
+        for agent_id, month, override_mask, available_mask in db.session.query(
+            AvailabilityOverride.agent_id, AvailabilityOverride.month, AvailabilityOverride.override_mask, AvailabilityOverride.available_mask
+        ).filter(AvailabilityOverride.agent_id.in_(agent_ids))
+    }
+    to_delete = [key for key in stored if key not in wanted]
+    to_update = [
+        {"agent_id": agent_id, "month": month, "override_mask": masks[0], "available_mask": masks[1]}
+        for (agent_id, month), masks in wanted.items()
+        if (agent_id, month) in stored and stored[(agent_id, month)] != masks
+    ]
+    to_insert = [
+        {"agent_id": agent_id, "month": month, "override_mask": masks[0], "available_mask": masks[1]}
+        for (agent_id, month), masks in wanted.items()
+        if (agent_id, month) not in stored
+    ]
+    if to_delete:
+        db.session.execute(delete(AvailabilityOverride).where(tuple_(AvailabilityOverride.agent_id, AvailabilityOverride.month).in_(to_delete)))
+    if to_update:
+        db.session.execute(update(AvailabilityOverride), to_update)
+    if to_insert:
+        db.session.execute(insert(AvailabilityOverride), to_insert)
+
+    if mask_updates or mask_inserts or to_delete or to_update or to_insert:
+        bump_cache_version(AVAILABILITY_VERSION)
+
+    changes["inserted"] = len(mask_inserts) + len(to_insert)
+    changes["updated"] = len(mask_updates) + len(to_update)
+    changes["deleted"] = len(to_delete)
+    return changes
+
+
+@app.route("/api/agents/availability/update/<int:agent_id>", methods=["PUT"])
+@login_required
+def update_availability(agent_id):
+    try:
+        update = parse_availability_payload(request.json)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({"message": "Invalid availability data"}), 400
+
+    try:
+        changes = apply_availability_updates({agent_id: update})
         db.session.commit()
+        logger.info(f"Updated availability for agent {agent_id}: {changes}")
         return jsonify({"message": "Availability updated"})
     except Exception as e:
         db.session.rollback()
@@ -401,6 +918,39 @@ def update_availability(agent_id):
         return jsonify({"message": "Failed to update availability"}), 500
 
 
+@app.route("/api/agents/availability/bulk_update", methods=["PUT"])
+@login_required
+def bulk_update_availability():
+    # {"agents": [{"agent_id": 1, "weeklyAvailability": [...], "specificDates": {...}}, ...]}
+    data = request.get_json(silent=True) or {}
+    entries = data.get("agents")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"message": "agents must be a non-empty list"}), 400
+
+    updates = {}
+    try:
+        for entry in entries:
+            updates[int(entry["agent_id"])] = parse_availability_payload(entry)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({"message": "Invalid availability data"}), 400
+
+    known_ids = {agent_id for (agent_id,) in db.session.query(Agent.agent_id).filter(Agent.agent_id.in_(list(updates)))}
+    unknown_ids = sorted(set(updates) - known_ids)
+    if unknown_ids:
+        return jsonify({"message": "Unknown agent ids", "agent_ids": unknown_ids}), 400
+
+    try:
+        with QueryCounter(db.engine) as queries:
+            changes = apply_availability_updates(updates)
+            db.session.commit()
+        logger.info(f"Bulk updated availability for {len(updates)} agents: {changes}, {queries.stats()}")
+        return jsonify({"message": f"Availability updated for {len(updates)} agents", **changes})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error bulk updating availability: {str(e)}")
+        return jsonify({"message": "Failed to update availability"}), 500
+
+
 class Blacklist(db.Model):
     __tablename__ = "blacklist"
     blacklist_id = db.Column(db.Integer, primary_key=True)
@@ -411,6 +961,7 @@ class Blacklist(db.Model):
 
 @app.route("/api/agents/blacklist/get/<int:agent_id>", methods=["GET"])
 @login_required
+@replica_reads
 def get_blacklist_for_agent(agent_id):
     try:
         blacklist_entries = Blacklist.query.filter(
@@ -481,7 +1032,8 @@ def update_blacklist(agent_id):
 class Schedule(db.Model):
     __tablename__ = "schedules"
     schedule_id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date)
+    # One schedule per week; databases created before this need flask dedupe-schedules
+    date = db.Column(db.Date, index=True, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -500,183 +1052,454 @@ class ScheduleDetail(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
-    # For day number, Sunday is 0, Saturday is 6
-def is_agent_available(agent_id, day_number, current_day):
-    logging.debug(f"Checking availability for agent {agent_id} on {current_day} ({day_number})")
-    specific_avail = Availability.query.filter_by(
-        agent_id=agent_id, date=current_day
-    ).first()
-    if specific_avail is not None:
-        logging.debug(f"Specific availability found: {specific_avail.is_available}")
-        return specific_avail.is_available
-
-    recurring_avail = RecurringAvailability.query.filter_by(
-        agent_id=agent_id, day_of_week=day_number
-    ).first()
-    if recurring_avail is not None:
-        logging.debug(f"Recurring availability found: {recurring_avail.is_available}")
-        return recurring_avail.is_available
-
-    logging.debug("No availability found")
-    return False  # Unavailable if both specific and recurring availabilities are None
-
-def create_schedule(monday_date):
-    logging.debug(f"Creating schedule for week starting on {monday_date}")
-    pairing_delta = relativedelta(months=6)
-
-    active_agents = Agent.query.filter_by(active_status=True).all()
-    logging.debug(f"Active agents: {len(active_agents)}")
-
-    week_availability = defaultdict(lambda: defaultdict(bool))
-    for agent in active_agents:
-        for day_offset in range(7):
-            current_day = monday_date + timedelta(days=day_offset)
-            is_available = is_agent_available(agent.agent_id, 0 if day_offset == 6 else day_offset + 1, current_day)
-            week_availability[agent.agent_id][day_offset] = is_available
-    
-    unavailable_agents = [agent for agent in active_agents if not any(week_availability[agent.agent_id][day_offset] for day_offset in range(7))]
-    logging.debug(f"Unavailable agents: {len(unavailable_agents)}")
+class PairingHistory(db.Model):
+    # One row per pairing, agent1_id < agent2_id, kept in step with paired schedule_details
+    __tablename__ = "pairing_history"
+    __table_args__ = (
+        db.Index("ix_pairing_history_paired_date", "paired_date"),
+        db.Index("ix_pairing_history_pair_date", "agent1_id", "agent2_id", "paired_date"),
+    )
+    history_id = db.Column(db.Integer, primary_key=True)
+    agent1_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"))
+    agent2_id = db.Column(db.Integer, db.ForeignKey("agents.agent_id"))
+    paired_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    active_agents = [agent for agent in active_agents if any(week_availability[agent.agent_id][day_offset] for day_offset in range(7))]
-    logging.debug(f"Filtered active agents: {len(active_agents)}")
 
-    removed_agent = None
-    if len(active_agents) % 2 == 1:
-        removed_agent = random.choice(active_agents)
-        logging.debug(f"Removing agent {removed_agent.agent_id} to make even pairs")
-        active_agents.remove(removed_agent)
+class ScheduleJob(db.Model):
+    # Queued schedule generation, run by job_queue; see jobs.JobQueue
+    __tablename__ = "schedule_jobs"
+    job_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64))
+    # Set only while queued or running, so duplicate requests share the job
+    active_key = db.Column(db.String(255), unique=True)
+    params = db.Column(db.Text)
+    status = db.Column(db.String(16))
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
 
-    all_blacklisted_pairs = Blacklist.query.all()
-    blacklisted_set = {(bl.agent1_id, bl.agent2_id) for bl in all_blacklisted_pairs}
-    logging.debug(f"Blacklisted pairs: {blacklisted_set}")
 
-    past_pairings = (
-        db.session.query(ScheduleDetail.agent1_id, ScheduleDetail.agent2_id)
-        .join(Schedule)
-        .filter(ScheduleDetail.is_paired, Schedule.date > monday_date - pairing_delta, Schedule.date < monday_date + pairing_delta)
-        .all()
-    )
-    past_pairings_set = {(pp.agent1_id, pp.agent2_id) for pp in past_pairings}
-    logging.debug(f"Past pairings: {past_pairings_set}")
-
-    available_pairings = []
-    for i, agent1 in enumerate(active_agents):
-        for agent2 in active_agents[i + 1 :]:
-            if (agent1.agent_id, agent2.agent_id) in blacklisted_set or (agent1.agent_id, agent2.agent_id) in blacklisted_set:
-                logging.debug(f"Skipping blacklisted pair: {agent1.agent_id}, {agent2.agent_id}")
-                continue
-
-            if (agent1.agent_id, agent2.agent_id) in past_pairings_set or (agent2.agent_id, agent1.agent_id) in past_pairings_set:
-                logging.debug(f"Skipping past paired agents: {agent1.agent_id}, {agent2.agent_id}")
-                continue
+job_queue = JobQueue(
+    app,
+    db,
+    ScheduleJob,
+    workers=app.config["SCHEDULE_JOB_WORKERS"],
+    stale_after=timedelta(seconds=app.config["SCHEDULE_JOB_STALE_SECONDS"]),
+)
 
-            if any(week_availability[agent1.agent_id][day_offset] and week_availability[agent2.agent_id][day_offset] for day_offset in range(7)):
-                available_pairings.append((agent1, agent2))
 
-    logging.debug(f"Available pairings: {[(a1.agent_id, a2.agent_id) for a1, a2 in available_pairings]}")
+# Upper bound for a pairing window asked for per call, in months
+MAX_WINDOW_MONTHS = 24
+# Upper bound for one /api/schedule/generate_range call, about a year
+MAX_GENERATE_WEEKS = 53
 
-    selected_pairings = []
-    unpaired_agents = set(agent.agent_id for agent in active_agents)
+def is_agent_available(agent_id, current_day):
+    # A specific date beats the recurring weekday; neither means unavailable
+    return agent_available_on(agent_id, [current_day])[current_day]
 
-    agent_to_partners = defaultdict(set)
-    for agent1, agent2 in available_pairings:
-        agent_to_partners[agent1.agent_id].add(agent2.agent_id)
-        agent_to_partners[agent2.agent_id].add(agent1.agent_id)
 
-    pq = [(len(partners), agent_id) for agent_id, partners in agent_to_partners.items()]
-    heapq.heapify(pq)
+def load_week_availability(agent_ids, monday_date):
+    return load_availability_calendar(agent_ids, monday_date, monday_date + timedelta(days=7)).week(monday_date, agent_ids)
 
-    # If performance is an issue, could add some sort of break once all reasonable connections are made
-    while pq and unpaired_agents:
-        # Remove the most constrained agent
-        constraint, agent_id = heapq.heappop(pq)
 
-        if agent_id not in unpaired_agents or constraint != len(agent_to_partners[agent_id]):
-            continue
+def load_last_paired(before_date):
+    # Most recent pairing date per pair as (agent1_id, agent2_id, date), for PairRecency
+    return (
+        db.session.query(PairingHistory.agent1_id, PairingHistory.agent2_id, func.max(PairingHistory.paired_date))
+        .filter(PairingHistory.paired_date < before_date)
+        .group_by(PairingHistory.agent1_id, PairingHistory.agent2_id)
+        .all()
+    )
 
-        for partner_id in list(agent_to_partners[agent_id]):
-            if partner_id in unpaired_agents:
-                logging.debug(f"Pairing agents: {agent_id}, {partner_id}")
-                selected_pairings.append((agent_id, partner_id))
-                unpaired_agents.remove(agent_id)
-                unpaired_agents.remove(partner_id)
+def load_next_paired(mondays):
+    # Earliest pairing date per pair after the first of mondays as (agent1_id, agent2_id, date),
+    # for PairRecency; the weeks about to be regenerated do not count
+    return (
+        db.session.query(PairingHistory.agent1_id, PairingHistory.agent2_id, func.min(PairingHistory.paired_date))
+        .filter(PairingHistory.paired_date > min(mondays), PairingHistory.paired_date.notin_(mondays))
+        .group_by(PairingHistory.agent1_id, PairingHistory.agent2_id)
+        .all()
+    )
 
-                agent_possible_partners = agent_to_partners[agent_id]
-                del agent_to_partners[agent_id]
-                agent_possible_partners.remove(partner_id)
+def pairing_settings(mode=None, window_months=None):
+    # Fill in the configured defaults; recency mode has no hard window unless one is asked for
+    mode = mode or app.config["PAIRING_MODE"]
+    if window_months is None:
+        window_months = app.config["PAIRING_WINDOW_MONTHS"] if mode == "window" else 0
+    return mode, window_months
+
+def parse_pairing_settings(data):
+    # mode and window_months of a request, ValueError with a message for the client when invalid
+    mode = data.get("mode")
+    if mode and mode not in PAIRING_MODES:
+        raise ValueError(f"Unknown mode. Use one of: {', '.join(PAIRING_MODES)}")
+    window_months = data.get("window_months")
+    if window_months is not None:
+        try:
+            window_months = int(window_months)
+        except (TypeError, ValueError):
+            raise ValueError("window_months must be a whole number of months")
+        if not 0 <= window_months <= MAX_WINDOW_MONTHS:
+            raise ValueError(f"window_months must be between 0 and {MAX_WINDOW_MONTHS}")
+    return pairing_settings(mode, window_months)
+
+def load_scheduling_state(mondays, window, recency=False):
+    # Everything create_schedule reads, for one or more weeks that are about to be (re)generated.
+    # recency loads the rest of the history into a PairRecency, for the weighted solver and recency mode
+    first_monday, last_monday = min(mondays), max(mondays)
+
+    agent_ids = [agent_id for (agent_id,) in db.session.query(Agent.agent_id).filter_by(active_status=True).order_by(Agent.agent_id)]
+    availability = load_availability_calendar(agent_ids, first_monday, last_monday + timedelta(days=7))
+
+    blacklisted_pairs = {(bl.agent1_id, bl.agent2_id) for bl in db.session.query(Blacklist.agent1_id, Blacklist.agent2_id)}
+
+    # The weeks being generated are replaced, so their current pairings must not count
+    past_pairings = (
+        db.session.query(PairingHistory.agent1_id, PairingHistory.agent2_id, PairingHistory.paired_date)
+        .filter(
+            PairingHistory.paired_date > first_monday - window,
+            PairingHistory.paired_date < last_monday + window,
+            PairingHistory.paired_date.notin_(mondays),
+        )
+        .all()
+    )
+    pair_recency = PairRecency(agent_ids, load_last_paired(first_monday), load_next_paired(mondays)) if recency else None
+    return SchedulingState(
+        agent_ids, availability, blacklisted_pairs, past_pairings, pair_recency, app.config["CANDIDATE_GRAPH_CHECK"]
+    )
 
-                partner_possible_partners = agent_to_partners[partner_id]
-                del agent_to_partners[partner_id]
-                partner_possible_partners.remove(agent_id)
+def create_schedule(monday_date, solver=None, time_budget=None, state=None, mode=None, window_months=None):
+    solver = solver or app.config["PAIRING_SOLVER"]
+    if time_budget is None:
+        time_budget = app.config["PAIRING_TIME_BUDGET"]
+    mode, window_months = pairing_settings(mode, window_months)
+    window = relativedelta(months=window_months)
+    if state is None:
+        with instrumentation.phase("schedule_load"):
+            state = load_scheduling_state([monday_date], window, recency=solver == "weighted" or mode == "recency")
+    return plan_week(state, monday_date, window, solver, time_budget, phase=instrumentation.phase, mode=mode)
 
-                reprocess = set()
-                
-                # Iterate through places our partner is paired with
-                for other_partner_id in partner_possible_partners:
-                    agent_to_partners[other_partner_id].discard(partner_id)
-                    reprocess.add(other_partner_id)
 
-                # Iterate through places our partner is paired with
-                for other_partner_id in agent_possible_partners:
-                    agent_to_partners[other_partner_id].discard(agent_id)
-                    reprocess.add(other_partner_id)
+schedule_locks = NamedLocks("rp_scheduler", timeout=app.config["SCHEDULE_LOCK_TIMEOUT"])
 
-                for agent in reprocess:
-                    heapq.heappush(pq, (len(agent_to_partners[agent]), agent))
 
-                break
+@contextmanager
+def schedule_lock(dates):
+    """Serialize generating and saving the given weeks across threads and workers."""
+    with schedule_locks.hold(db.engine, (f"schedule:{date.isoformat()}" for date in dates)):
+        # A transaction begun before the lock (loading the user, say) would keep reading
+        # a REPEATABLE READ snapshot from before the previous holder committed
+        db.session.commit()
+        yield
 
-    unpaired_agents_list = list(unpaired_agents)
-    if removed_agent is not None:
-        unpaired_agents_list.append(removed_agent.agent_id)
 
-    unpaired_agents_list.extend(agent.agent_id for agent in unavailable_agents)
+def generate_schedule_func(monday_date, solver=None, time_budget=None, missing_only=False, mode=None, window_months=None):
+    # Pair first, then replace any existing schedule for this date in one transaction.
+    # With missing_only an existing schedule is kept, so callers that merely need the
+    # week to exist share whatever a concurrent generation produced
+    logging.debug(f"Generating schedule for {monday_date}")
+    with schedule_lock([monday_date]):
+        if missing_only and db.session.query(Schedule.schedule_id).filter_by(date=monday_date).first() is not None:
+            logger.info(f"Schedule for {monday_date} was generated while waiting, not generating again")
+            return {"skipped": True}
+        with QueryCounter(db.engine) as queries:
+            agent_pairings, unpaired_agents, stats = create_schedule(monday_date, solver, time_budget, mode=mode, window_months=window_months)
+            with instrumentation.phase("schedule_persist"):
+                save_schedules([(monday_date, agent_pairings, unpaired_agents)])
+    logger.info(f"Generated schedule for {monday_date}: {queries.stats()}")
+    stats["db"] = queries.stats()
+    return stats
+
+
+def invalidate_schedule_cache(dates=None):
+    # Drop rendered /api/schedule/get payloads for the given dates, or all of them
+    if dates is None:
+        schedule_cache.clear()
+    else:
+        schedule_cache.delete(*(date.isoformat() for date in dates))
 
-    logging.debug(f"Selected pairings: {selected_pairings}")
-    logging.debug(f"Unpaired agents: {unpaired_agents_list}")
 
-    return selected_pairings, unpaired_agents_list
+def save_schedules(week_results):
+    # Replace the schedules for every (monday_date, pairings, unpaired) in one transaction
+    dates = [monday_date for monday_date, _, _ in week_results]
+    try:
+        old_schedule_ids = [schedule_id for (schedule_id,) in db.session.query(Schedule.schedule_id).filter(Schedule.date.in_(dates))]
+        if old_schedule_ids:
+            db.session.execute(delete(ScheduleDetail).where(ScheduleDetail.schedule_id.in_(old_schedule_ids)))
+            db.session.execute(delete(Schedule).where(Schedule.schedule_id.in_(old_schedule_ids)))
+        db.session.execute(delete(PairingHistory).where(PairingHistory.paired_date.in_(dates)))
+
+        schedules = [Schedule(date=monday_date) for monday_date in dates]
+        db.session.add_all(schedules)
+        db.session.flush()
 
+        detail_rows = []
+        for schedule, (_, pairings, unpaired) in zip(schedules, week_results):
+            detail_rows.extend(
+                {"schedule_id": schedule.schedule_id, "agent1_id": agent1_id, "agent2_id": agent2_id, "is_paired": True}
+                for agent1_id, agent2_id in pairings
+            )
+            detail_rows.extend(
+                {"schedule_id": schedule.schedule_id, "agent1_id": agent_id, "agent2_id": None, "is_paired": False}
+                for agent_id in unpaired
+            )
+        if detail_rows:
+            db.session.execute(insert(ScheduleDetail), detail_rows)
 
-def generate_schedule_func(monday_date):
-    # Check if a schedule already exists for this date and delete it if so
-    logging.debug(f"Generating schedule for {monday_date}")
-    existing_schedule = Schedule.query.filter_by(date=monday_date).first()
-    if existing_schedule:
-        logging.debug(f"Deleting existing schedule for {monday_date}")
-        ScheduleDetail.query.filter_by(
-            schedule_id=existing_schedule.schedule_id
-        ).delete()
-        db.session.delete(existing_schedule)
+        history_rows = [
+            {"agent1_id": min(agent1_id, agent2_id), "agent2_id": max(agent1_id, agent2_id), "paired_date": monday_date}
+            for monday_date, pairings, _ in week_results
+            for agent1_id, agent2_id in pairings
+        ]
+        if history_rows:
+            db.session.execute(insert(PairingHistory), history_rows)
         db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_schedule_cache(dates)
+
+
+def generate_schedule_range(start_date, weeks, solver=None, time_budget=None, mode=None, window_months=None):
+    # Load state once, generate consecutive weeks in order and write them all together
+    solver = solver or app.config["PAIRING_SOLVER"]
+    mode, window_months = pairing_settings(mode, window_months)
+    mondays = [start_date + timedelta(weeks=week) for week in range(weeks)]
+    with schedule_lock(mondays), QueryCounter(db.engine) as queries:
+        state = load_scheduling_state(mondays, relativedelta(months=window_months), recency=solver == "weighted" or mode == "recency")
+
+        week_results = []
+        week_stats = []
+        for monday_date in mondays:
+            pairings, unpaired, stats = create_schedule(monday_date, solver, time_budget, state, mode, window_months)
+            # Later weeks must not repeat these pairings
+            state.record_pairings(monday_date, pairings)
+            week_results.append((monday_date, pairings, unpaired))
+            week_stats.append({"date": monday_date.isoformat(), **stats})
+
+        with instrumentation.phase("schedule_persist"):
+            save_schedules(week_results)
+    logger.info(f"Generated {weeks} schedules from {start_date}: {queries.stats()}")
+    return week_stats
+
+
+@app.cli.command("generate-range")
+@click.argument("start", type=click.DateTime(formats=["%Y-%m-%d"]))
+@click.option("--weeks", default=13, show_default=True, help="Number of consecutive weeks to generate.")
+@click.option("--solver", type=click.Choice(SOLVERS), default=None, help="Pairing solver, defaults to PAIRING_SOLVER.")
+@click.option("--time-budget", type=float, default=None, help="Seconds allowed per week for the blossom solver.")
+@click.option("--mode", type=click.Choice(PAIRING_MODES), default=None, help="Pairing mode, defaults to PAIRING_MODE.")
+@click.option("--window-months", type=click.IntRange(0, MAX_WINDOW_MONTHS), default=None, help="Months either side of a week in which pairings are not repeated.")
+def generate_range_command(start, weeks, solver, time_budget, mode, window_months):
+    """Generate and save schedules for WEEKS consecutive weeks starting on START (YYYY-MM-DD)."""
+    for stats in generate_schedule_range(start.date(), weeks, solver, time_budget, mode, window_months):
+        click.echo(f"{stats['date']}: {stats['matched'] // 2} pairs, {stats['unpaired_total']} unpaired")
+
+
+def rebuild_pairing_history():
+    # Recreate pairing_history from paired schedule_details in one INSERT ... SELECT
+    low = case((ScheduleDetail.agent1_id < ScheduleDetail.agent2_id, ScheduleDetail.agent1_id), else_=ScheduleDetail.agent2_id)
+    high = case((ScheduleDetail.agent1_id < ScheduleDetail.agent2_id, ScheduleDetail.agent2_id), else_=ScheduleDetail.agent1_id)
+    source = (
+        select(low, high, Schedule.date, func.now())
+        .join(Schedule, Schedule.schedule_id == ScheduleDetail.schedule_id)
+        .where(ScheduleDetail.is_paired, ScheduleDetail.agent1_id.isnot(None), ScheduleDetail.agent2_id.isnot(None))
+    )
+    try:
+        db.session.execute(delete(PairingHistory))
+        result = db.session.execute(
+            insert(PairingHistory).from_select(["agent1_id", "agent2_id", "paired_date", "created_at"], source)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount
+
 
-    agent_pairings, unpaired_agents = create_schedule(monday_date)
-    if agent_pairings:
-        schedule = Schedule(date=monday_date)
-        db.session.add(schedule)
+@app.cli.command("backfill-pairing-history")
+def backfill_pairing_history_command():
+    """Create missing tables and indexes, then rebuild pairing_history from schedule_details."""
+    db.create_all()
+    # create_all skips tables that already exist, so add their new indexes separately.
+    # Unique ones fail on existing duplicates; dedupe-schedules creates ix_schedules_date
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if not index.unique:
+                index.create(db.engine, checkfirst=True)
+    click.echo(f"Rebuilt pairing_history with {rebuild_pairing_history()} rows")
+
+
+# Tables replaced by weekly_availability and availability_overrides
+LEGACY_AVAILABILITY_TABLES = ("recurring_availability", "availability")
+
+
+def migrate_legacy_availability(batch_size=500):
+    """Fold recurring_availability/availability rows into weekly masks and override bitmaps.
+
+    The first row per agent and day wins, as the old per-day lookups did. Safe
+    to run again: agents are rewritten through apply_availability_updates.
+    """
+    existing_tables = set(inspect(db.engine).get_table_names())
+    recurring = defaultdict(dict)
+    specific = defaultdict(dict)
+    if "recurring_availability" in existing_tables:
+        table = Table("recurring_availability", MetaData(), autoload_with=db.engine)
+        rows = db.session.execute(select(table.c.agent_id, table.c.day_of_week, table.c.is_available).order_by(table.c.id))
+        for agent_id, day_of_week, is_available in rows:
+            recurring[agent_id].setdefault(int(day_of_week), bool(is_available))
+    if "availability" in existing_tables:
+        table = Table("availability", MetaData(), autoload_with=db.engine)
+        rows = db.session.execute(select(table.c.agent_id, table.c.date, table.c.is_available).order_by(table.c.availability_id))
+        for agent_id, specific_date, is_available in rows:
+            specific[agent_id].setdefault(specific_date, bool(is_available))
+
+    known_ids = {agent_id for (agent_id,) in db.session.query(Agent.agent_id)}
+    agent_ids = sorted((set(recurring) | set(specific)) & known_ids)
+    changes = {"agents": len(agent_ids), "inserted": 0, "updated": 0, "deleted": 0}
+    for start in range(0, len(agent_ids), batch_size):
+        batch = agent_ids[start : start + batch_size]
+        try:
+            batch_changes = apply_availability_updates({agent_id: (recurring[agent_id], specific[agent_id]) for agent_id in batch})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        for key, value in batch_changes.items():
+            changes[key] += value
+    return changes
+
+
+@app.cli.command("migrate-availability")
+@click.option("--drop-legacy", is_flag=True, help="Drop recurring_availability and availability afterwards.")
+def migrate_availability_command(drop_legacy):
+    """Convert per-day availability rows into weekly masks and monthly override bitmaps."""
+    db.create_all()
+    changes = migrate_legacy_availability()
+    click.echo(f"Migrated availability: {changes}")
+    if drop_legacy:
+        existing_tables = set(inspect(db.engine).get_table_names())
+        for name in LEGACY_AVAILABILITY_TABLES:
+            if name in existing_tables:
+                Table(name, MetaData(), autoload_with=db.engine).drop(db.engine)
+                click.echo(f"Dropped {name}")
+
+
+def dedupe_schedules():
+    """Keep the newest schedule of every week that has several, deleting the others and their details.
+
+    Returns the dates that had duplicates; pairing_history is rebuilt when there were any.
+    """
+    newest = (
+        db.session.query(Schedule.date, func.max(Schedule.schedule_id))
+        .group_by(Schedule.date)
+        .having(func.count(Schedule.schedule_id) > 1)
+        .all()
+    )
+    if not newest:
+        return []
+    dates = [date for date, _ in newest]
+    keep_ids = [schedule_id for _, schedule_id in newest]
+    try:
+        stale_ids = [
+            schedule_id
+            for (schedule_id,) in db.session.query(Schedule.schedule_id).filter(Schedule.date.in_(dates), Schedule.schedule_id.notin_(keep_ids))
+        ]
+        db.session.execute(delete(ScheduleDetail).where(ScheduleDetail.schedule_id.in_(stale_ids)))
+        db.session.execute(delete(Schedule).where(Schedule.schedule_id.in_(stale_ids)))
         db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Racing generations each wrote their pairings to the history
+    rebuild_pairing_history()
+    invalidate_schedule_cache(dates)
+    return dates
 
-        for agent1_id, agent2_id in agent_pairings:
-            logging.debug(f"Adding paired agents: {agent1_id}, {agent2_id}")
-            schedule_detail = ScheduleDetail(
-                schedule_id=schedule.schedule_id,
-                agent1_id=agent1_id,
-                agent2_id=agent2_id,
-                is_paired=True
-            )
-            db.session.add(schedule_detail)
-
-    if unpaired_agents:
-        for agent_id in unpaired_agents:
-            logging.debug(f"Adding unpaired agent: {agent_id}")
-            schedule_detail = ScheduleDetail(
-                schedule_id=schedule.schedule_id,
-                agent1_id=agent_id,
-                is_paired=False
-            )
-            db.session.add(schedule_detail)
 
-    db.session.commit()
+@app.cli.command("dedupe-schedules")
+def dedupe_schedules_command():
+    """Remove duplicate schedules per week, then make schedules.date unique."""
+    db.create_all()
+    dates = dedupe_schedules()
+    click.echo(f"Removed duplicate schedules for {len(dates)} weeks: {', '.join(date.isoformat() for date in dates)}")
+    # The index used to be non-unique; replace it under the same name
+    for index in Table("schedules", MetaData(), autoload_with=db.engine).indexes:
+        if index.name == "ix_schedules_date" and not index.unique:
+            index.drop(db.engine)
+    for index in Schedule.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    click.echo("schedules.date is unique")
+
+
+@app.cli.command("import-roster")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=5000, show_default=True, help="Rows read and committed per batch.")
+def import_roster_command(path, chunk_size):
+    """Add agents from a roster CSV/XLSX and update the phone and email of existing ones."""
+    from importer import import_roster
+
+    stats = import_roster(path, chunk_size, progress=click.echo)
+    invalidate_agent_id_cache()
+    click.echo(f"Imported roster: {stats.summary()}")
+
+
+@app.cli.command("import-schedules")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", default=5000, show_default=True, help="Rows read per batch.")
+@click.option("--batch-weeks", default=13, show_default=True, help="Weeks saved per transaction.")
+@click.option("--replace-all", is_flag=True, help="Delete every existing schedule first.")
+def import_schedules_command(paths, chunk_size, batch_weeks, replace_all):
+    """Load historical pairings from the monthly schedule CSV/XLSX exports, replacing those weeks."""
+    from importer import import_schedules
+
+    stats = import_schedules(paths, chunk_size, batch_weeks, replace_all, progress=click.echo)
+    click.echo(f"Imported schedules: {stats.summary()}")
+
+
+@job_queue.handler("generate_schedule")
+def run_generate_schedule_job(date, solver, time_budget, missing_only=False, mode=None, window_months=None):
+    return generate_schedule_func(datetime.strptime(date, "%Y-%m-%d").date(), solver, time_budget, missing_only, mode, window_months)
+
+
+@job_queue.handler("generate_schedule_range")
+def run_generate_schedule_range_job(start, weeks, solver, time_budget, mode=None, window_months=None):
+    return generate_schedule_range(datetime.strptime(start, "%Y-%m-%d").date(), weeks, solver, time_budget, mode, window_months)
+
+
+def queue_schedule_generation(monday_date, solver=None, time_budget=None, missing_only=False, mode=None, window_months=None):
+    # Requests for the same week and settings share one job while it is queued or running
+    solver = solver or app.config["PAIRING_SOLVER"]
+    mode, window_months = pairing_settings(mode, window_months)
+    key = f"generate_schedule:{monday_date.isoformat()}:{solver}:{time_budget}:{mode}:{window_months}"
+    params = {
+        "date": monday_date.isoformat(),
+        "solver": solver,
+        "time_budget": time_budget,
+        "missing_only": missing_only,
+        "mode": mode,
+        "window_months": window_months,
+    }
+    return job_queue.submit("generate_schedule", key, params)
+
+
+def job_accepted_response(job, created, message):
+    response = jsonify({"message": message if created else "Already queued", "job": job_payload(job)})
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job.job_id}"
+    return response
+
+
+@app.route("/api/jobs/<int:job_id>", methods=["GET"])
+@login_required
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job_payload(job)), 200
 
 
 @app.route("/api/schedule/generate", methods=["POST"])
@@ -688,32 +1511,168 @@ def generate_schedule():
     else:
         return jsonify({"error": "Date parameter is required"}), 400
 
-    generate_schedule_func(date)
+    solver = request.args.get("solver")
+    if solver and solver not in SOLVERS:
+        return jsonify({"error": f"Unknown solver. Use one of: {', '.join(SOLVERS)}"}), 400
+    time_budget = request.args.get("time_budget", type=float)
+    try:
+        mode, window_months = parse_pairing_settings(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({"message": "Schedule generated"}), 201
+    job, created = queue_schedule_generation(date, solver, time_budget, mode=mode, window_months=window_months)
+    return job_accepted_response(job, created, "Schedule generation queued")
 
 
-@app.route("/api/schedule/get", methods=["GET"])
+@app.route("/api/schedule/generate_range", methods=["POST"])
 @login_required
-def get_schedule():
-    date_str = request.args.get("date")  # Getting the date from query parameter
+def generate_schedule_range_route():
+    data = request.get_json(silent=True) or request.args
+    date_str = data.get("start")
     if not date_str:
-        return jsonify({"error": "Date parameter is required"}), 400
-
+        return jsonify({"error": "Start parameter is required"}), 400
     try:
-        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        start_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        weeks = int(data.get("weeks", 13))
+        time_budget = float(data["time_budget"]) if data.get("time_budget") is not None else None
     except ValueError:
-        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+        return jsonify({"error": "Invalid start, weeks or time_budget. Use YYYY-MM-DD and numbers."}), 400
+    if not 1 <= weeks <= MAX_GENERATE_WEEKS:
+        return jsonify({"error": f"Weeks must be between 1 and {MAX_GENERATE_WEEKS}"}), 400
 
-    schedule = Schedule.query.filter_by(date=date).first()
+    solver = data.get("solver")
+    if solver and solver not in SOLVERS:
+        return jsonify({"error": f"Unknown solver. Use one of: {', '.join(SOLVERS)}"}), 400
 
-    if not schedule:
-        generate_schedule_func(date)
-        schedule = Schedule.query.filter_by(date=date).first()
+    try:
+        mode, window_months = parse_pairing_settings(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    solver = solver or app.config["PAIRING_SOLVER"]
+    key = f"generate_schedule_range:{start_date.isoformat()}:{weeks}:{solver}:{time_budget}:{mode}:{window_months}"
+    params = {
+        "start": start_date.isoformat(),
+        "weeks": weeks,
+        "solver": solver,
+        "time_budget": time_budget,
+        "mode": mode,
+        "window_months": window_months,
+    }
+    job, created = job_queue.submit("generate_schedule_range", key, params)
+    return job_accepted_response(job, created, f"Generation of {weeks} schedules queued")
 
-    if not schedule:
-        return jsonify({"error": "Regenerated schedule not found"}), 400
-    
+
+# Most candidates one preview may ask for
+MAX_PREVIEW_CANDIDATES = 8
+
+_preview_pool = None
+_preview_pool_pid = None
+_preview_pool_lock = threading.Lock()
+
+
+def get_preview_pool():
+    global _preview_pool, _preview_pool_pid
+    if app.config["PREVIEW_WORKERS"] <= 0:
+        return None
+    with _preview_pool_lock:
+        # Per worker process, created after gunicorn's fork; spawn keeps the children
+        # clear of this process's threads, locks and database connections
+        if _preview_pool is None or _preview_pool_pid != os.getpid():
+            _preview_pool = ProcessPoolExecutor(app.config["PREVIEW_WORKERS"], mp_context=multiprocessing.get_context("spawn"))
+            _preview_pool_pid = os.getpid()
+        return _preview_pool
+
+
+def run_previews(state, monday_date, variants, time_budget, window, mode):
+    """preview_candidate for every (solver, seed) in variants, in parallel when a pool is configured."""
+    global _preview_pool
+    pool = get_preview_pool()
+    if pool is None:
+        return [preview_candidate(state, monday_date, window, solver, time_budget, seed, mode) for solver, seed in variants]
+    try:
+        futures = [pool.submit(preview_candidate, state, monday_date, window, solver, time_budget, seed, mode) for solver, seed in variants]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        # A child died (out of memory, say); start a fresh pool for the next preview
+        with _preview_pool_lock:
+            _preview_pool = None
+        raise
+
+
+@app.route("/api/schedule/preview", methods=["POST"])
+@login_required
+def preview_schedule():
+    # Dry run: alternative schedules for one week with quality metrics, nothing is written.
+    # Each candidate's details/unpaired can be posted as-is to /api/schedule/set to keep it
+    data = request.get_json(silent=True) or {}
+    try:
+        monday_date = datetime.strptime(data.get("date", ""), "%Y-%m-%d").date()
+        count = int(data.get("candidates", 4))
+        time_budget = float(data["time_budget"]) if data.get("time_budget") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid date, candidates or time_budget. Use YYYY-MM-DD and numbers."}), 400
+    if not 1 <= count <= MAX_PREVIEW_CANDIDATES:
+        return jsonify({"error": f"Candidates must be between 1 and {MAX_PREVIEW_CANDIDATES}"}), 400
+    solvers = data.get("solvers") or [app.config["PAIRING_SOLVER"]]
+    if not isinstance(solvers, list) or any(solver not in SOLVERS for solver in solvers):
+        return jsonify({"error": f"Unknown solver. Use one of: {', '.join(SOLVERS)}"}), 400
+    try:
+        mode, window_months = parse_pairing_settings(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    window = relativedelta(months=window_months)
+
+    started = time.perf_counter()
+    with QueryCounter(db.engine) as queries:
+        # The recency matrix is loaded for every solver, the metrics need it
+        state = load_scheduling_state([monday_date], window, recency=True)
+        names = {agent_id: f"{first_name} {last_name}" for agent_id, first_name, last_name in db.session.query(Agent.agent_id, Agent.first_name, Agent.last_name).filter(Agent.agent_id.in_(state.agent_ids))}
+
+    # Solvers take turns, each further round with the next seed
+    variants = [(solvers[i % len(solvers)], i // len(solvers)) for i in range(count)]
+    with instrumentation.phase("schedule_preview"):
+        results = run_previews(state, monday_date, variants, time_budget, window, mode)
+
+    candidates = []
+    seen = set()
+    for result in results:
+        # Different seeds can land on the same matching; keep the first
+        key = frozenset(frozenset(pair) for pair in result["pairings"])
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates.append(
+            {
+                "solver": result["solver"],
+                "seed": result["seed"],
+                "metrics": result["metrics"],
+                "stats": result["stats"],
+                "details": [
+                    {"agent1_id": agent1_id, "agent1_name": names.get(agent1_id), "agent2_id": agent2_id, "agent2_name": names.get(agent2_id)}
+                    for agent1_id, agent2_id in result["pairings"]
+                ],
+                "unpaired": [{"agent_id": agent_id, "agent_name": names.get(agent_id)} for agent_id in result["unpaired"]],
+            }
+        )
+    # Fewest unpaired first, then the longest average time since partners last met
+    candidates.sort(key=lambda candidate: (candidate["metrics"]["unpaired_total"], -(candidate["metrics"]["avg_days_since_last_pairing"] or 0)))
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Previewed {len(candidates)} distinct of {count} candidates for {monday_date} in {elapsed_ms} ms: {queries.stats()}")
+    return jsonify(
+        {
+            "date": monday_date.isoformat(),
+            "mode": mode,
+            "window_months": window_months,
+            "candidates": candidates,
+            "elapsed_ms": elapsed_ms,
+            "db": queries.stats(),
+        }
+    )
+
+
+def build_schedule_payload(schedule):
     Agent1 = aliased(Agent)
     Agent2 = aliased(Agent)
 
@@ -779,7 +1738,101 @@ def get_schedule():
             } for agent in unpaired_agents
         ]
     }
-    return jsonify(schedule_data)
+    return schedule_data
+
+
+@app.route("/api/schedule/get", methods=["GET"])
+@login_required
+def get_schedule():
+    date_str = request.args.get("date")  # Getting the date from query parameter
+    if not date_str:
+        return jsonify({"error": "Date parameter is required"}), 400
+
+    try:
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+
+    schedule = Schedule.query.filter_by(date=date).first()
+
+    if not schedule:
+        # Generated in the background; poll the job, then ask again
+        job, created = queue_schedule_generation(date, missing_only=True)
+        return job_accepted_response(job, created, "Schedule is being generated")
+
+    # Replacing a week always creates a new schedule row, and renaming or deleting agents
+    # bumps the roster version, so a cached payload for an older schedule_id or version
+    # is stale even if this worker never saw the invalidation
+    version = cache_version(ROSTER_VERSION)
+    cached = schedule_cache.get(date.isoformat())
+    if cached is None or cached["schedule_id"] != schedule.schedule_id or cached.get("roster_version") != version:
+        schedule_data = build_schedule_payload(schedule)
+        etag = hashlib.sha1(json.dumps(schedule_data, sort_keys=True).encode()).hexdigest()
+        cached = {"schedule_id": schedule.schedule_id, "roster_version": version, "etag": etag, "payload": schedule_data}
+        schedule_cache.set(date.isoformat(), cached)
+
+    response = jsonify(cached["payload"])
+    response.set_etag(cached["etag"])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Rows fetched per round trip while exporting; with PyMySQL this also switches to a server side cursor
+EXPORT_CHUNK_ROWS = 500
+
+
+def schedule_export_rows(start_date, end_date):
+    """Yield (date, agent1 name, agent2 name, is_paired) for every schedule detail in the range."""
+    Agent1 = aliased(Agent)
+    Agent2 = aliased(Agent)
+    statement = (
+        select(
+            Schedule.date,
+            Agent1.first_name,
+            Agent1.last_name,
+            Agent2.first_name,
+            Agent2.last_name,
+            ScheduleDetail.is_paired,
+        )
+        .join(ScheduleDetail, ScheduleDetail.schedule_id == Schedule.schedule_id)
+        .outerjoin(Agent1, Agent1.agent_id == ScheduleDetail.agent1_id)
+        .outerjoin(Agent2, Agent2.agent_id == ScheduleDetail.agent2_id)
+        .where(Schedule.date >= start_date, Schedule.date <= end_date)
+        .order_by(Schedule.date, ScheduleDetail.is_paired.desc(), Agent1.last_name, Agent1.first_name)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    for date, first1, last1, first2, last2, is_paired in db.session.execute(statement):
+        agent1_name = f"{first1} {last1}" if first1 is not None else None
+        agent2_name = f"{first2} {last2}" if first2 is not None else None
+        yield date, agent1_name, agent2_name, is_paired
+
+
+@app.route("/api/schedule/export", methods=["GET"])
+@login_required
+@replica_reads
+def export_schedule():
+    try:
+        start_date = datetime.strptime(request.args.get("start", ""), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get("end", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start and end are required. Use YYYY-MM-DD."}), 400
+    if end_date < start_date:
+        return jsonify({"error": "end must not be before start"}), 400
+
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    title = f"Schedule {start_date.isoformat()} to {end_date.isoformat()}"
+    filename = f"schedule_{start_date.isoformat()}_{end_date.isoformat()}.{export_format}"
+    # stream_with_context keeps the request (and its database session) alive while the body is sent
+    body = stream_with_context(stream_export(export_format, schedule_export_rows(start_date, end_date), title))
+    return Response(
+        body,
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 
 @app.route("/api/schedule/set", methods=["POST"]) 
 @login_required
@@ -796,77 +1849,74 @@ def set_schedule():
     details = data["details"]
     unpaired = data.get("unpaired", [])
     
-    existing_schedule = Schedule.query.filter_by(date=date).first()
-    if existing_schedule:
-        ScheduleDetail.query.filter_by(schedule_id=existing_schedule.schedule_id).delete()
-        db.session.delete(existing_schedule)
-        db.session.commit()
+    def entry_id(entry, id_key, name_key):
+        # Callers that already know the agent_id can skip name resolution entirely
+        if entry.get(id_key) is not None:
+            return int(entry[id_key])
+        return agent_ids.get(entry.get(name_key))
+
+    with QueryCounter(db.engine) as queries:
+        names = [detail.get(key) for detail in details for key in ("agent1_name", "agent2_name")]
+        names += [agent.get("agent_name") for agent in unpaired]
+        agent_ids = resolve_agent_ids(name for name in names if name)
+
+        pairings = []
+        unpaired_ids = []
+
+        try:
+            for detail in details:
+                agent1_id = entry_id(detail, "agent1_id", "agent1_name")
+                agent2_id = entry_id(detail, "agent2_id", "agent2_name")
+                has_agent1 = detail.get("agent1_id") or detail.get("agent1_name")
+                has_agent2 = detail.get("agent2_id") or detail.get("agent2_name")
+                if has_agent1 and has_agent2:
+                    if agent1_id and agent2_id:
+                        pairings.append((agent1_id, agent2_id))
+                    else:
+                        if not agent1_id:
+                            logger.error(f"Could not process given agent name {detail.get('agent1_name')}")
+                        if not agent2_id:
+                            logger.error(f"Could not process given agent name {detail.get('agent2_name')}")
+                elif has_agent1 and agent1_id:
+                    unpaired_ids.append(agent1_id)
+                elif has_agent2 and agent2_id:
+                    unpaired_ids.append(agent2_id)
+
+            for agent in unpaired:
+                agent_id = entry_id(agent, "agent_id", "agent_name")
+                if agent_id:
+                    unpaired_ids.append(agent_id)
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({"error": "Agent ids must be integers"}), 400
+
+        # Checked up front; SQLite, for one, does not enforce the foreign keys
+        given_ids = {agent_id for pair in pairings for agent_id in pair} | set(unpaired_ids)
+        known_ids = {agent_id for (agent_id,) in db.session.query(Agent.agent_id).filter(Agent.agent_id.in_(given_ids))}
+        unknown_ids = sorted(given_ids - known_ids)
+        if unknown_ids:
+            return jsonify({"error": "Unknown agent ids", "agent_ids": unknown_ids}), 400
+
+        try:
+            with schedule_lock([date]):
+                save_schedules([(date, pairings, unpaired_ids)])
+        except IntegrityError:
+            # An agent deleted since the check above
+            return jsonify({"error": "Schedule refers to an unknown agent_id"}), 400
+    logger.info(f"Set schedule for {date}: {queries.stats()}")
 
-    new_schedule = Schedule(date=date)
-    db.session.add(new_schedule)
-    db.session.commit()
+    return jsonify({"message": "Schedule set successfully"}), 200
 
-    def get_agent_id_by_name(name):
-        first_name, last_name = name.split(" ")
-        agent = Agent.query.filter_by(first_name=first_name, last_name=last_name).first()
-        return agent.agent_id if agent else None
-    
-    extra_unpaired = []
-    
-    for detail in details:
-        agent1_name = detail.get("agent1_name")
-        agent2_name = detail.get("agent2_name")
-        if agent1_name and agent2_name:
-            agent1_id = get_agent_id_by_name(agent1_name)
-            agent2_id = get_agent_id_by_name(agent2_name)
-            if agent1_id and agent2_id:
-                new_schedule_detail = ScheduleDetail(
-                    schedule_id=new_schedule.schedule_id,
-                    agent1_id=agent1_id,
-                    agent2_id=agent2_id,
-                    is_paired=True
-                )
-                db.session.add(new_schedule_detail)
-            else:
-                if not agent1_id:
-                    logger.error(f"Could not process given agent name {agent1_name}")
-                if not agent1_id:
-                    logger.error(f"Could not process given agent name {agent2_name}")
-        elif agent1_name and not agent2_name:
-            extra_unpaired.append(agent1_name)
-        elif agent2_name and not agent1_name:
-            extra_unpaired.append(agent2_name)
-    
-    for agent in unpaired:
-        print(agent)
-        agent_name = agent.get("agent_name")
-        print(agent_name)
-        if agent_name:
-            agent_id = get_agent_id_by_name(agent_name)
-            if agent_id:
-                new_schedule_detail = ScheduleDetail(
-                    schedule_id=new_schedule.schedule_id,
-                    agent1_id=agent_id,
-                    is_paired=False
-                )
-                db.session.add(new_schedule_detail)
-
-    for agent in extra_unpaired:
-        agent_name = agent
-        print(agent_name)
-        if agent_name:
-            agent_id = get_agent_id_by_name(agent_name)
-            if agent_id:
-                new_schedule_detail = ScheduleDetail(
-                    schedule_id=new_schedule.schedule_id,
-                    agent1_id=agent_id,
-                    is_paired=False
-                )
-                db.session.add(new_schedule_detail)
 
-    db.session.commit()
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    # Scraped by Prometheus, which can't log in; protect it with METRICS_TOKEN or at the proxy
+    if not instrumentation.enabled:
+        return jsonify({"message": "Instrumentation is disabled"}), 404
+    token = app.config["METRICS_TOKEN"]
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return jsonify({"message": "Unauthorized"}), 401
+    return Response(instrumentation.metrics.render(), mimetype="text/plain; version=0.0.4")
 
-    return jsonify({"message": "Schedule set successfully"}), 200
 
 @app.errorhandler(Exception)
 def handle_exception(e):
@@ -884,5 +1934,14 @@ def internal_server_error(e):
     return jsonify({"message": "Internal server error"}), 500
 
 
+def create_app():
+    """WSGI entry point for gunicorn, e.g. gunicorn "app:create_app()".
+
+    Routes are registered on the module level app, so this returns it; see
+    gunicorn.conf.py for preloading it once in the master process.
+    """
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
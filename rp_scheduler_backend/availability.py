@@ -0,0 +1,155 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+DAYS_IN_WEEK = 7
+
+# Bit value of each day offset (Monday is offset 0) in a 7-bit week mask
+DAY_BITS = 1 << np.arange(DAYS_IN_WEEK, dtype=np.uint8)
+
+
+def day_number(day_offset):
+    # For day number, Sunday is 0, Saturday is 6
+    return 0 if day_offset == 6 else day_offset + 1
+
+
+class WeekAvailability:
+    """Agents x 7 boolean availability matrix for one week starting on a Monday."""
+
+    def __init__(self, monday_date, agent_ids, matrix):
+        self.monday_date = monday_date
+        self.agent_ids = list(agent_ids)
+        self.matrix = matrix
+        self.index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+
+    @property
+    def masks(self):
+        # One 7-bit int per agent, bit d set when the agent is available on day offset d
+        return (self.matrix.astype(np.uint8) * DAY_BITS).sum(axis=1, dtype=np.uint8)
+
+    def is_available(self, agent_id, day_offset):
+        return bool(self.matrix[self.index[agent_id], day_offset])
+
+    def available_agent_ids(self):
+        return [self.agent_ids[i] for i in np.flatnonzero(self.matrix.any(axis=1))]
+
+    def unavailable_agent_ids(self):
+        return [self.agent_ids[i] for i in np.flatnonzero(~self.matrix.any(axis=1))]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def weekday_bit(day):
+    # Weekly masks are indexed by day number, Sunday is 0
+    return 1 << ((day.weekday() + 1) % 7)
+
+
+def month_day_bit(day):
+    # Override bitmaps use bit d - 1 for day d of the month
+    return 1 << (day.day - 1)
+
+
+def iter_month_days(mask):
+    day = 1
+    while mask:
+        if mask & 1:
+            yield day
+        mask >>= 1
+        day += 1
+
+
+class AvailabilityCalendar:
+    """Recurring weekday masks and per-month override bitmaps for a set of agents.
+
+    weekly_masks maps agent_id to a 7-bit mask (bit n set when available on day
+    number n). override_rows are (agent_id, month start, override_mask,
+    available_mask): bit d - 1 of override_mask marks day d as having a specific
+    availability and the same bit of available_mask holds it. A specific date
+    beats the recurring weekday, and an agent with neither is unavailable.
+    """
+
+    def __init__(self, weekly_masks, override_rows=()):
+        self.weekly_masks = dict(weekly_masks)
+        self.months = defaultdict(dict)
+        for agent_id, month, override_mask, available_mask in override_rows:
+            self.months[month][agent_id] = (override_mask, available_mask)
+
+    def is_available(self, agent_id, day):
+        override_mask, available_mask = self.months.get(month_start(day), {}).get(agent_id, (0, 0))
+        bit = month_day_bit(day)
+        if override_mask & bit:
+            return bool(available_mask & bit)
+        return bool(self.weekly_masks.get(agent_id, 0) & weekday_bit(day))
+
+    def available_on(self, agent_id, dates):
+        return {day: self.is_available(agent_id, day) for day in dates}
+
+    def specific_dates(self, agent_id):
+        """{date: is_available} for every overridden day of the agent, oldest first."""
+        specific = {}
+        for month in sorted(self.months):
+            masks = self.months[month].get(agent_id)
+            if masks is None:
+                continue
+            override_mask, available_mask = masks
+            for day in iter_month_days(override_mask):
+                specific[month.replace(day=day)] = bool(available_mask >> (day - 1) & 1)
+        return specific
+
+    def week(self, monday_date, agent_ids):
+        agent_ids = list(agent_ids)
+        masks = np.fromiter((self.weekly_masks.get(agent_id, 0) for agent_id in agent_ids), dtype=np.uint8, count=len(agent_ids))
+        day_numbers = np.array([day_number(offset) for offset in range(DAYS_IN_WEEK)], dtype=np.uint8)
+        matrix = ((masks[:, None] >> day_numbers) & 1).astype(bool)
+
+        # Only agents with overrides in the week's month(s) need looking at
+        index = None
+        for offset in range(DAYS_IN_WEEK):
+            day = monday_date + timedelta(days=offset)
+            overrides = self.months.get(month_start(day))
+            if not overrides:
+                continue
+            if index is None:
+                index = {agent_id: i for i, agent_id in enumerate(agent_ids)}
+            bit = month_day_bit(day)
+            for agent_id, (override_mask, available_mask) in overrides.items():
+                if override_mask & bit and agent_id in index:
+                    matrix[index[agent_id], offset] = bool(available_mask & bit)
+
+        return WeekAvailability(monday_date, agent_ids, matrix)
+
+
+def encode_availability(recurring, specific):
+    """({day_number: is_available}, {date: is_available}) -> (weekly mask, {month start: (override_mask, available_mask)})."""
+    weekly_mask = sum(1 << day for day, is_available in recurring.items() if is_available)
+    months = {}
+    for day, is_available in specific.items():
+        override_mask, available_mask = months.get(month_start(day), (0, 0))
+        bit = month_day_bit(day)
+        months[month_start(day)] = (override_mask | bit, available_mask | bit if is_available else available_mask & ~bit)
+    return weekly_mask, months
+
+
+def parse_availability_payload(data):
+    """Turn an availability update payload into the rows it describes.
+
+    data has "weeklyAvailability" (available day numbers, Sunday is 0) and
+    "specificDates" ({"YYYY-M": [day, ...]} with a zero-based month) listing
+    the dates that flip the agent's usual availability. Returns
+    ({day_number: is_available}, {date: is_available}); raises ValueError,
+    KeyError or TypeError on malformed input.
+    """
+    weekly_days = {int(day) for day in data["weeklyAvailability"]}
+    recurring = {day: day in weekly_days for day in range(DAYS_IN_WEEK)}
+
+    specific = {}
+    for year_month, days in data["specificDates"].items():
+        year, month = map(int, year_month.split("-"))
+        for day in days:
+            specific_date = date(year, month + 1, int(day))
+            # A listed date is the opposite of what the agent usually does that weekday
+            specific[specific_date] = not recurring[(specific_date.weekday() + 1) % 7]
+    return recurring, specific
@@ -0,0 +1,98 @@
+"""Compare CompatibilityEngine against the nested pair loop create_schedule used to run.
+
+    python benchmarks/bench_compatibility.py --sizes 100 500 1000 2000 5000
+
+"adjacency ms" is the bitset work alone. "partners ms" is what the scheduler
+actually pays per week: building the week's CandidateGraph and turning it into
+the adjacency submatrix the solvers take (CandidateGraph.submatrix), as
+pairing.plan_week does.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pairing import CandidateGraph, CompatibilityEngine  # noqa: E402
+
+
+def synthetic_week(n, availability_density, exclusion_density, seed):
+    rng = random.Random(seed)
+    agent_ids = list(range(1, n + 1))
+    masks = [sum(1 << d for d in range(7) if rng.random() < availability_density) for _ in agent_ids]
+    excluded = set()
+    for _ in range(int(n * exclusion_density)):
+        a, b = rng.sample(agent_ids, 2)
+        excluded.add((min(a, b), max(a, b)))
+    return agent_ids, masks, excluded
+
+
+def legacy_pairs(agent_ids, masks, excluded):
+    week_availability = {agent_id: {d: bool(mask >> d & 1) for d in range(7)} for agent_id, mask in zip(agent_ids, masks)}
+    available_pairings = []
+    for i, agent1 in enumerate(agent_ids):
+        for agent2 in agent_ids[i + 1 :]:
+            if (agent1, agent2) in excluded or (agent2, agent1) in excluded:
+                continue
+            if any(week_availability[agent1][d] and week_availability[agent2][d] for d in range(7)):
+                available_pairings.append((agent1, agent2))
+    return available_pairings
+
+
+def engine_pairs(agent_ids, masks, excluded):
+    engine = CompatibilityEngine(agent_ids, masks)
+    engine.exclude(excluded)
+    return engine
+
+
+def scheduler_partners(agent_ids, masks, excluded):
+    return CandidateGraph(agent_ids, masks, excluded).submatrix(agent_ids)
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--availability-density", type=float, default=0.4)
+    parser.add_argument("--exclusion-density", type=float, default=10.0, help="excluded pairs per agent")
+    parser.add_argument("--legacy-max", type=int, default=2000, help="largest size to run the Python loop on")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'agents':>8} {'build ms':>10} {'adjacency ms':>13} {'partners ms':>12} {'pairs ms':>9} {'legacy ms':>10} {'pairs':>10}  match")
+    for n in args.sizes:
+        agent_ids, masks, excluded = synthetic_week(n, args.availability_density, args.exclusion_density, args.seed)
+
+        build_time, engine = best_of(args.repeat, engine_pairs, agent_ids, masks, excluded)
+        adjacency_time, _ = best_of(args.repeat, engine.adjacency)
+        partners_time, _ = best_of(args.repeat, scheduler_partners, agent_ids, masks, excluded)
+        pairs_time, pairs = best_of(1, engine.candidate_pairs)
+
+        legacy_time, matches = None, "-"
+        if n <= args.legacy_max:
+            legacy_time, expected = best_of(1, legacy_pairs, agent_ids, masks, excluded)
+            matches = "yes" if set(expected) == set(pairs) else "NO"
+
+        legacy_ms = f"{legacy_time * 1e3:10.1f}" if legacy_time is not None else f"{'-':>10}"
+        print(
+            f"{n:>8} {build_time * 1e3:10.2f} {adjacency_time * 1e3:13.2f} {partners_time * 1e3:12.1f} {pairs_time * 1e3:9.1f} "
+            f"{legacy_ms} {len(pairs):>10}  {matches}"
+        )
+        if matches == "NO":
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
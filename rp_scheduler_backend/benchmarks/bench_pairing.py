@@ -0,0 +1,235 @@
+"""Benchmark the full schedule generation pipeline on synthetic rosters.
+
+    python benchmarks/bench_pairing.py --output results.json
+    python benchmarks/bench_pairing.py --sizes 10000 --availability-density 0.1 --solvers greedy
+    python benchmarks/bench_pairing.py --compare results.json
+
+Every size gets a fresh SQLite database in a temporary directory, filled with
+a synthetic roster (recurring availability, a few date overrides, blacklist
+pairs and history_weeks of past pairings). generate_schedule_func then runs
+once per solver, exactly as /api/schedule/generate would. Results are JSON so
+runs from different commits can be diffed or compared with --compare.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Compared between runs by --compare; larger is worse for all of them
+COMPARED_METRICS = ("wall_ms", "solve_ms", "queries", "peak_mb", "unpaired_total")
+
+
+def load_app(workdir):
+    # app reads its database and log location at import time
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.chdir(workdir)
+    import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+    return app
+
+
+def populate(app, n, availability_density, blacklist_density, override_rate, history_weeks, monday, seed):
+    """Fill an empty database with a synthetic roster around the week starting on monday."""
+    rng = np.random.default_rng(seed)
+    db = app.db
+    db.drop_all()
+    db.create_all()
+
+    agent_ids = list(range(1, n + 1))
+    db.session.execute(
+        app.insert(app.Agent),
+        [{"agent_id": agent_id, "first_name": f"First{agent_id}", "last_name": f"Last{agent_id}", "active_status": True} for agent_id in agent_ids],
+    )
+
+    available = rng.random((n, 7)) < availability_density
+    day_masks = (available * (1 << np.arange(7))).sum(axis=1)
+    db.session.execute(
+        app.insert(app.WeeklyAvailability),
+        [{"agent_id": agent_id, "day_mask": int(day_masks[i])} for i, agent_id in enumerate(agent_ids)],
+    )
+
+    overridden = np.flatnonzero(rng.random(n) < override_rate) + 1
+    if len(overridden):
+        overrides = []
+        for agent_id in overridden.tolist():
+            override_date = monday + timedelta(days=int(rng.integers(7)))
+            bit = app.month_day_bit(override_date)
+            overrides.append(
+                {
+                    "agent_id": agent_id,
+                    "month": app.month_start(override_date),
+                    "override_mask": bit,
+                    "available_mask": bit if rng.random() < 0.5 else 0,
+                }
+            )
+        db.session.execute(app.insert(app.AvailabilityOverride), overrides)
+
+    blacklist = set()
+    for _ in range(int(n * blacklist_density)):
+        a, b = sorted(rng.choice(n, 2, replace=False) + 1)
+        blacklist.add((int(a), int(b)))
+    if blacklist:
+        db.session.execute(app.insert(app.Blacklist), [{"agent1_id": a, "agent2_id": b} for a, b in blacklist])
+    db.session.commit()
+
+    # Past weeks get a random perfect matching each, saved the way generated weeks are
+    history = []
+    for week in range(1, history_weeks + 1):
+        order = (rng.permutation(n) + 1).tolist()
+        history.append((monday - timedelta(weeks=week), list(zip(order[::2], order[1::2])), []))
+    if history:
+        app.save_schedules(history)
+
+
+def measure(app, monday, solver, memory):
+    """Run the pipeline once; with memory, a second run under tracemalloc records the peak."""
+    random.seed(0)
+    started = time.perf_counter()
+    stats = app.generate_schedule_func(monday, solver)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    peak_mb = None
+    if memory:
+        random.seed(0)
+        tracemalloc.start()
+        app.generate_schedule_func(monday, solver)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return stats, wall_ms, peak_mb
+
+
+def optimum_unpaired(app, monday):
+    # Blossom gives a maximum cardinality matching, so its unpaired count is the floor
+    _, unpaired, stats = app.create_schedule(monday, solver="blossom", time_budget=None)
+    return len(unpaired), stats["complete"]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "-C", BACKEND_DIR, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    monday = date.fromisoformat(args.monday)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        with app.app.app_context():
+            for n in args.sizes:
+                setup_started = time.perf_counter()
+                populate(
+                    app, n, args.availability_density, args.blacklist_density, args.override_rate, args.history_weeks, monday, args.seed
+                )
+                setup_ms = (time.perf_counter() - setup_started) * 1000
+
+                floor = None
+                if n <= args.optimum_max:
+                    floor, complete = optimum_unpaired(app, monday)
+                    floor = floor if complete else None
+
+                for solver in args.solvers:
+                    stats, wall_ms, peak_mb = measure(app, monday, solver, not args.no_memory)
+                    result = {
+                        "agents": n,
+                        "solver": solver,
+                        "wall_ms": round(wall_ms, 2),
+                        "solve_ms": stats["solve_time_ms"],
+                        "queries": stats["db"]["queries"],
+                        "commits": stats["db"]["commits"],
+                        "query_ms": stats["db"]["query_time_ms"],
+                        "peak_mb": round(peak_mb, 2) if peak_mb is not None else None,
+                        "pairs": stats["matched"] // 2,
+                        "unpaired_total": stats["unpaired_total"],
+                        "min_unpaired_total": floor,
+                        "setup_ms": round(setup_ms, 1),
+                    }
+                    results.append(result)
+                    print(
+                        f"{n:>7} {solver:>8} {result['wall_ms']:10.1f} {result['solve_ms']:10.1f} {result['queries']:>8} "
+                        f"{result['peak_mb'] if result['peak_mb'] is not None else '-':>8} "
+                        f"{result['unpaired_total']:>9} {floor if floor is not None else '-':>9}",
+                        file=sys.stderr,
+                    )
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+
+
+def compare(previous, current):
+    before = {(row["agents"], row["solver"]): row for row in previous["results"]}
+    print(f"\nvs {previous['meta'].get('revision')} ({previous['meta'].get('created')})")
+    for row in current["results"]:
+        old = before.get((row["agents"], row["solver"]))
+        if old is None:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if row.get(metric) is None or old.get(metric) is None:
+                continue
+            delta = row[metric] - old[metric]
+            relative = f" ({delta / old[metric]:+.0%})" if old[metric] else ""
+            changes.append(f"{metric} {old[metric]} -> {row[metric]}{relative}")
+        print(f"{row['agents']:>7} {row['solver']:>8}  " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # The candidate graph is dense at the default availability, so 10000 agents needs several GB
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 2000, 5000])
+    parser.add_argument("--solvers", nargs="+", default=["greedy", "blossom"], choices=["greedy", "blossom", "weighted"])
+    parser.add_argument("--availability-density", type=float, default=0.3, help="chance an agent is available on each weekday")
+    parser.add_argument("--blacklist-density", type=float, default=0.5, help="blacklisted pairs per agent")
+    parser.add_argument("--override-rate", type=float, default=0.1, help="share of agents with a date override that week")
+    parser.add_argument("--history-weeks", type=int, default=26, help="weeks of past pairings before the target week")
+    parser.add_argument("--monday", default="2024-06-03", help="week to generate (YYYY-MM-DD, a Monday)")
+    parser.add_argument("--optimum-max", type=int, default=5000, help="largest size to compute the minimum unpaired count for")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    # load_app changes into a temporary directory
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    print(f"{'agents':>7} {'solver':>8} {'wall ms':>10} {'solve ms':>10} {'queries':>8} {'peak MB':>8} {'unpaired':>9} {'minimum':>9}", file=sys.stderr)
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Measure what importing app costs a gunicorn worker: -X importtime totals and RSS.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --baseline HEAD~1 --repeat 5
+
+Each run imports app in a fresh interpreter, with a throwaway SQLite database
+and working directory so nothing touches the real database or app.log.
+--baseline also measures the backend as of that git revision for comparison.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as status:
+        rss_kb = int(next(line for line in status if line.startswith("VmRSS")).split()[1])
+except OSError:
+    pass
+print(json.dumps({"import_ms": elapsed * 1000, "rss_kb": rss_kb}))
+"""
+
+# "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| *(\S+)")
+
+
+def measure(backend_dir):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATABASE_URI="sqlite://", SECRET_KEY="bench", FLASK_ENV="production")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, backend_dir],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # Self time summed per top level package (the first dotted component)
+    packages = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, module = match.groups()
+        total_us += int(self_us)
+        packages[module.split(".")[0]] += int(self_us)
+    stats["importtime_ms"] = total_us / 1000
+    stats["packages"] = {name: us / 1000 for name, us in packages.items()}
+    return stats
+
+
+def export_revision(revision, destination):
+    repo_root = subprocess.run(
+        ["git", "-C", BACKEND_DIR, "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    prefix = os.path.relpath(BACKEND_DIR, repo_root)
+    archive = subprocess.run(
+        ["git", "-C", repo_root, "archive", "--format=tar", revision, prefix], capture_output=True, check=True
+    ).stdout
+    with tempfile.TemporaryFile() as tar_file:
+        tar_file.write(archive)
+        tar_file.seek(0)
+        with tarfile.open(fileobj=tar_file) as tar:
+            tar.extractall(destination)
+    return os.path.join(destination, prefix)
+
+
+def summarize(label, backend_dir, repeat, top):
+    runs = [measure(backend_dir) for _ in range(repeat)]
+    packages = defaultdict(list)
+    for run in runs:
+        for name, ms in run["packages"].items():
+            packages[name].append(ms)
+    summary = {
+        "label": label,
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "importtime_ms": statistics.median(run["importtime_ms"] for run in runs),
+        "rss_mb": statistics.median(run["rss_kb"] for run in runs) / 1024,
+        "top_packages": sorted(
+            ((name, statistics.median(times)) for name, times in packages.items()), key=lambda item: -item[1]
+        )[:top],
+    }
+    print(
+        f"{label:>10}: import {summary['import_ms']:7.1f} ms, -X importtime total {summary['importtime_ms']:7.1f} ms, "
+        f"RSS {summary['rss_mb']:6.1f} MB"
+    )
+    for name, ms in summary["top_packages"]:
+        print(f"{'':>12}{name:<24}{ms:8.1f} ms")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement (median is shown)")
+    parser.add_argument("--top", type=int, default=8, help="packages to list by self import time")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON as well")
+    args = parser.parse_args()
+
+    summaries = []
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as checkout:
+            summaries.append(summarize(args.baseline, export_revision(args.baseline, checkout), args.repeat, args.top))
+    summaries.append(summarize("current", BACKEND_DIR, args.repeat, args.top))
+
+    if args.baseline:
+        before, after = summaries
+        print(
+            f"\nimport {after['import_ms'] - before['import_ms']:+.1f} ms, "
+            f"RSS {after['rss_mb'] - before['rss_mb']:+.1f} MB per worker"
+        )
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-process LRU. Each gunicorn worker has its own copy."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Cache shared by every worker through Redis. Values must be JSON serializable."""
+
+    def __init__(self, url, prefix, ttl=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self._key(key), json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self._key(key) for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def make_cache(url, prefix, maxsize=256, ttl=None):
+    # "memory" keeps a per-process LRU, redis:// URLs share one cache between workers
+    if not url or url == "memory":
+        return LRUCache(maxsize)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, prefix, ttl)
+    raise ValueError(f"Unsupported cache URL {url!r}")
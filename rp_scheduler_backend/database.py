@@ -0,0 +1,119 @@
+"""Engine settings, read replica routing and a pool that times checkouts.
+
+Everything is driven from app.config (filled from the environment in app.py):
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, DB_POOL_USE_LIFO, DB_ISOLATION_LEVEL,
+    DB_CONNECT_TIMEOUT, DB_STATEMENT_TIMEOUT_MS, DATABASE_REPLICA_URI
+"""
+import time
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+REPLICA_BIND = "replica"
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout took to wait_listener(seconds).
+
+    The time covers waiting for a free connection and, when the pool has room
+    to grow, opening a new one, which is what a request actually stalls on.
+    """
+
+    wait_listener = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.wait_listener is not None:
+                self.wait_listener(time.perf_counter() - started)
+
+    def recreate(self):
+        # dispose() swaps in a new pool, the listener has to move with it
+        pool = super().recreate()
+        pool.wait_listener = self.wait_listener
+        return pool
+
+
+def engine_options(uri, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri; SQLite keeps SQLAlchemy's own pooling."""
+    if not uri:
+        return {}
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return {}
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "pool_use_lifo": config["DB_POOL_USE_LIFO"],
+    }
+    if config["DB_ISOLATION_LEVEL"]:
+        options["isolation_level"] = config["DB_ISOLATION_LEVEL"]
+
+    connect_args = {}
+    if config["DB_CONNECT_TIMEOUT"]:
+        connect_args["connect_timeout"] = config["DB_CONNECT_TIMEOUT"]
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if timeout_ms:
+        if backend == "mysql":
+            # MySQL only enforces max_execution_time on SELECT statements
+            connect_args["init_command"] = f"SET SESSION max_execution_time={int(timeout_ms)}"
+        elif backend == "postgresql":
+            connect_args["options"] = f"-c statement_timeout={int(timeout_ms)}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def replica_binds(config):
+    uri = config["DATABASE_REPLICA_URI"]
+    if not uri:
+        return {}
+    return {REPLICA_BIND: {"url": uri, **engine_options(uri, config)}}
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica inside views marked with @replica_reads.
+
+    Flushes and any other statement (UPDATE, DELETE, locking reads made with
+    connection()) stay on the primary, as does everything outside those views.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_app_context()
+            and g.get("replica_reads")
+            and REPLICA_BIND in self._db.engines
+        ):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_reads(view):
+    """Route the view's reads to the replica, when one is configured.
+
+    Only for views that never write and can live with replication lag.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # g lasts for the request, which covers responses streamed after the view returns
+        g.replica_reads = True
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,196 @@
+import csv
+import io
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+EXPORT_HEADER = ("Week of", "Agent 1", "Agent 2", "Status")
+
+# Bytes to collect before handing a chunk to the response
+CHUNK_SIZE = 64 * 1024
+
+
+def export_record(row):
+    # row is (week date, agent1 name, agent2 name or None, is_paired)
+    week, agent1_name, agent2_name, is_paired = row
+    return (week.isoformat(), agent1_name or "", agent2_name or "", "Paired" if is_paired else "Unpaired")
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        writer.writerow(export_record(row))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream that keeps what was written until drained.
+
+    zipfile falls back to data descriptors on unseekable output, which is what
+    lets the xlsx be produced front to back without a temporary file.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile records offsets with tell() even when it can't seek
+        return self._position
+
+    def pending(self):
+        return self._size
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        return data
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Schedule" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_row(number, values):
+    # Inline strings avoid a shared string table, which would need every value up front
+    cells = "".join(f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>' for value in values)
+    return f'<row r="{number}">{cells}</row>'
+
+
+def stream_xlsx(rows):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(1, EXPORT_HEADER).encode())
+            for number, row in enumerate(rows, start=2):
+                sheet.write(_xlsx_row(number, export_record(row)).encode())
+                if sink.pending() >= CHUNK_SIZE:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def stream_pdf(rows, title):
+    """One section per week, continued across pages as needed.
+
+    reportlab only writes the document on save, so pages are rendered into a
+    temporary file and streamed from there once the last week is drawn.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    width, height = letter
+    margin = 54
+    line_height = 14
+
+    with tempfile.TemporaryFile() as output:
+        pdf = canvas.Canvas(output, pagesize=letter)
+        pdf.setTitle(title)
+        y = height - margin
+        week = None
+
+        def new_page():
+            pdf.showPage()
+            return height - margin
+
+        for row in rows:
+            record = export_record(row)
+            if record[0] != week:
+                if week is not None:
+                    y = new_page()
+                week = record[0]
+                pdf.setFont("Helvetica-Bold", 14)
+                pdf.drawString(margin, y, f"Week of {week}")
+                y -= line_height * 2
+                pdf.setFont("Helvetica", 10)
+            if y < margin:
+                y = new_page()
+                pdf.setFont("Helvetica", 10)
+            if record[3] == "Paired":
+                pdf.drawString(margin, y, f"{record[1]}  &  {record[2]}")
+            else:
+                pdf.drawString(margin, y, f"{record[1]}  (unpaired)")
+            y -= line_height
+
+        if week is None:
+            pdf.setFont("Helvetica", 10)
+            pdf.drawString(margin, y, "No schedules in this range")
+        pdf.save()
+
+        output.seek(0)
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_export(export_format, rows, title):
+    if export_format == "csv":
+        return stream_csv(rows)
+    if export_format == "xlsx":
+        return stream_xlsx(rows)
+    return stream_pdf(rows, title)
@@ -0,0 +1,15 @@
+# Picked up automatically when gunicorn is started from this directory:
+#
+#     gunicorn "app:create_app()"
+#
+# The app is imported once in the master and workers fork from it, sharing the
+# imported modules' memory instead of each importing them again.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (none normally) must not be shared with workers
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
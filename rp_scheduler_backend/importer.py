@@ -0,0 +1,213 @@
+"""Bulk import of the roster and historical schedules from the shared CSV/XLSX exports.
+
+Run through the flask CLI (see import-roster and import-schedules in app.py);
+this module pulls in pandas, so app only imports it from those commands.
+
+Roster files have one agent per row: "Last, First" in the first column, then
+phone, an unused column and email. Schedule files have a "Name" column with
+"Last, First - ..." and one "Week of MM/DD/YYYY" column per week holding the
+partner in the same format.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, insert, tuple_, update
+
+from app import ROSTER_VERSION, Agent, WeeklyAvailability, Schedule, ScheduleDetail, PairingHistory, bump_cache_version, db, save_schedules
+
+# Days new agents are marked available on (day numbers, Sunday is 0), as the old import did
+DEFAULT_AVAILABLE_DAYS = (1, 2, 3, 4, 5)
+
+# Name pairs per lookup query, keeps the IN list a reasonable size
+LOOKUP_BATCH = 500
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.skipped = 0
+        self.counts = {}
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(value)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        rate = self.rows / self.elapsed if self.elapsed else 0
+        counts = ", ".join(f"{key} {value}" for key, value in self.counts.items())
+        return f"{self.rows} rows ({self.skipped} skipped) in {self.elapsed:.2f} s, {rate:,.0f} rows/s; {counts}"
+
+
+def read_chunks(path, chunk_size):
+    """Yield the file as DataFrames of at most chunk_size string rows."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size, encoding="utf-8")
+    elif extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value) if value is not None else "" for value in next(rows)]
+            chunk = []
+            for row in rows:
+                chunk.append(["" if value is None else str(value) for value in row])
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file type {extension!r}, use .csv or .xlsx")
+
+
+def split_names(values):
+    """"Last, First - anything" -> (first, last) Series; unparseable entries are empty strings."""
+    names = values.fillna("").astype(str).str.split(" - ", n=1).str[0]
+    parts = names.str.split(",", n=1, expand=True).reindex(columns=[0, 1]).fillna("")
+    last = parts[0].str.strip()
+    first = parts[1].str.strip()
+    valid = (first != "") & (last != "")
+    return first.where(valid, ""), last.where(valid, "")
+
+
+def lookup_agent_ids(first_names, last_names):
+    """{(first, last): agent_id} for the names that exist, one query per LOOKUP_BATCH names."""
+    pairs = list(dict.fromkeys(zip(first_names, last_names)))
+    found = {}
+    for start in range(0, len(pairs), LOOKUP_BATCH):
+        batch = pairs[start : start + LOOKUP_BATCH]
+        rows = db.session.query(Agent.first_name, Agent.last_name, Agent.agent_id).filter(
+            tuple_(Agent.first_name, Agent.last_name).in_(batch)
+        )
+        found.update(((first, last), agent_id) for first, last, agent_id in rows)
+    return found
+
+
+def map_agent_ids(first, last, known):
+    keys = pd.Series(list(zip(first, last)), index=first.index, dtype=object)
+    return keys.map(known)
+
+
+def normalize_roster(frame):
+    first, last = split_names(frame.iloc[:, 0])
+    roster = pd.DataFrame(
+        {
+            "first_name": first,
+            "last_name": last,
+            "phone_number": frame.iloc[:, 1].str.strip() if frame.shape[1] > 1 else "",
+            "email": frame.iloc[:, 3].str.strip().str.lower() if frame.shape[1] > 3 else "",
+        }
+    )
+    roster = roster[roster["first_name"] != ""]
+    # The last row for a name wins, like applying the file top to bottom
+    roster = roster.drop_duplicates(["first_name", "last_name"], keep="last")
+    roster = roster.replace({"phone_number": {"": None}, "email": {"": None}})
+    return roster
+
+
+def import_roster(path, chunk_size=5000, progress=None):
+    """Insert new agents and update the phone/email of existing ones, one transaction per chunk."""
+    stats = ImportStats()
+    for frame in read_chunks(path, chunk_size):
+        roster = normalize_roster(frame)
+        stats.rows += len(frame)
+        stats.skipped += len(frame) - len(roster)
+
+        known = lookup_agent_ids(roster["first_name"], roster["last_name"])
+        roster = roster.assign(agent_id=map_agent_ids(roster["first_name"], roster["last_name"], known))
+        existing = roster[roster["agent_id"].notna()]
+        new = roster[roster["agent_id"].isna()].drop(columns="agent_id")
+
+        try:
+            if len(existing):
+                updates = existing.astype({"agent_id": int})[["agent_id", "phone_number", "email"]]
+                db.session.execute(update(Agent), updates.to_dict("records"))
+            if len(new):
+                db.session.execute(insert(Agent), new.assign(active_status=True).to_dict("records"))
+                new_ids = lookup_agent_ids(new["first_name"], new["last_name"]).values()
+                day_mask = sum(1 << day for day in DEFAULT_AVAILABLE_DAYS)
+                db.session.execute(insert(WeeklyAvailability), [{"agent_id": int(agent_id), "day_mask": day_mask} for agent_id in new_ids])
+                bump_cache_version(ROSTER_VERSION)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats.add(inserted=len(new), updated=len(existing))
+        if progress:
+            progress(stats.summary())
+    return stats
+
+
+def read_schedule_pairs(path, chunk_size, stats):
+    """Canonical (date, agent1_id, agent2_id) pairs from one schedule file, agent1_id < agent2_id."""
+    pairs = []
+    for frame in read_chunks(path, chunk_size):
+        stats.rows += len(frame)
+        week_columns = [column for column in frame.columns if column.startswith("Week of")]
+        long = frame.melt(id_vars=["Name"], value_vars=week_columns, var_name="week", value_name="partner")
+        long["date"] = pd.to_datetime(long["week"].str.split(" ").str[-1], format="%m/%d/%Y").dt.date
+
+        first1, last1 = split_names(long["Name"])
+        first2, last2 = split_names(long["partner"])
+        known = lookup_agent_ids(pd.concat([first1, first2]), pd.concat([last1, last2]))
+        agent1 = map_agent_ids(first1, last1, known)
+        agent2 = map_agent_ids(first2, last2, known)
+
+        resolved = agent1.notna() & agent2.notna() & (agent1 != agent2)
+        # A blank cell just means no pairing that week; only named agents that don't resolve are skipped
+        stats.skipped += int((~resolved & (last2 != "")).sum())
+        low = np.minimum(agent1[resolved], agent2[resolved]).astype(np.int64)
+        high = np.maximum(agent1[resolved], agent2[resolved]).astype(np.int64)
+        pairs.append(pd.DataFrame({"date": long.loc[resolved, "date"], "agent1_id": low, "agent2_id": high}))
+    return pairs
+
+
+def import_schedules(paths, chunk_size=5000, batch_weeks=13, replace_all=False, progress=None):
+    """Replace the weeks found in the files with their pairings, batch_weeks weeks per transaction.
+
+    Files are read completely first so a week split across two monthly files is
+    saved once with all of its pairs.
+    """
+    stats = ImportStats()
+    pairs = []
+    for path in paths:
+        pairs.extend(read_schedule_pairs(path, chunk_size, stats))
+        if progress:
+            progress(f"Read {path}: {stats.summary()}")
+    pairs = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame(columns=["date", "agent1_id", "agent2_id"])
+    # Each pairing is listed under both agents
+    pairs = pairs.drop_duplicates().sort_values(["date", "agent1_id", "agent2_id"])
+
+    if replace_all:
+        try:
+            db.session.execute(delete(PairingHistory))
+            db.session.execute(delete(ScheduleDetail))
+            db.session.execute(delete(Schedule))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    weeks = [
+        (date, list(zip(group["agent1_id"].tolist(), group["agent2_id"].tolist())), [])
+        for date, group in pairs.groupby("date", sort=True)
+    ]
+    for start in range(0, len(weeks), batch_weeks):
+        batch = weeks[start : start + batch_weeks]
+        save_schedules(batch)
+        stats.add(weeks=len(batch), pairings=sum(len(week[1]) for week in batch))
+        if progress:
+            progress(f"Saved weeks through {batch[-1][0]}: {stats.summary()}")
+    return stats
@@ -0,0 +1,331 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+from sqlalchemy import event
+
+
+# Counters open in the current thread, innermost last
+_counter_local = threading.local()
+# Engines that already carry the QueryCounter listeners
+_counted_engines = set()
+_counted_engines_lock = threading.Lock()
+
+
+def _active_counters(conn):
+    return [counter for counter in getattr(_counter_local, "active", ()) if counter.engine is conn.engine]
+
+
+def _count_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_counters(conn):
+        conn.info.setdefault("query_counter_started", []).append(time.perf_counter())
+
+
+def _count_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_counter_started")
+    if not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    for counter in _active_counters(conn):
+        counter.count += 1
+        counter.query_time += duration
+
+
+def _count_commit(conn):
+    for counter in _active_counters(conn):
+        counter.commits += 1
+
+
+class QueryCounter:
+    """Counts statements (database round trips), their time and commits on an engine.
+
+    Only activity from the thread that entered the block is counted, so other
+    requests served by the same process do not skew the numbers. The engine
+    listeners are registered once (see instrument) and stay; adding or removing
+    them while other threads run queries is not thread-safe.
+
+        QueryCounter.instrument(db.engine)  # at startup
+        with QueryCounter(db.engine) as queries:
+            ...
+        logger.info(f"{queries.count} queries in {queries.elapsed_ms} ms")
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.commits = 0
+        self.query_time = 0.0
+        self.elapsed = 0.0
+        self._started = None
+
+    @staticmethod
+    def instrument(engine):
+        """Register the listeners on engine, once. Call before serving queries."""
+        with _counted_engines_lock:
+            if engine in _counted_engines:
+                return
+            event.listen(engine, "before_cursor_execute", _count_before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _count_after_cursor_execute)
+            event.listen(engine, "commit", _count_commit)
+            _counted_engines.add(engine)
+
+    def __enter__(self):
+        # A no-op after startup; only engines that were never instrumented get their listeners here
+        self.instrument(self.engine)
+        if not hasattr(_counter_local, "active"):
+            _counter_local.active = []
+        _counter_local.active.append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._started
+        _counter_local.active.remove(self)
+        return False
+
+    @property
+    def elapsed_ms(self):
+        return round(self.elapsed * 1000, 3)
+
+    def stats(self):
+        return {
+            "queries": self.count,
+            "commits": self.commits,
+            "query_time_ms": round(self.query_time * 1000, 3),
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Checkouts are normally well under a millisecond, up to the pool timeout when exhausted
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class RequestTiming:
+    __slots__ = ("started", "queries", "query_time", "pool_wait", "phases")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.pool_wait = 0.0
+        self.phases = defaultdict(float)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Per-process request and phase metrics, rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own copy, so a scrape sees the worker that
+    answered it; sum across scrapes or run a single worker when that matters.
+    """
+
+    def __init__(self, prefix="scheduler", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._durations = {}
+        self._queries = defaultdict(int)
+        self._query_time = defaultdict(float)
+        self._phases = {}
+        self._pool_waits = {}
+        self._engines = {}
+
+    def add_engine(self, name, engine):
+        self._engines[name] = engine
+
+    def observe_request(self, method, endpoint, status, duration, queries, query_time):
+        with self._lock:
+            self._requests[(method, endpoint, status)] += 1
+            key = (method, endpoint)
+            if key not in self._durations:
+                self._durations[key] = Histogram(self.buckets)
+            self._durations[key].observe(duration)
+            self._queries[key] += queries
+            self._query_time[key] += query_time
+
+    def observe_phase(self, phase, duration):
+        with self._lock:
+            if phase not in self._phases:
+                self._phases[phase] = Histogram(self.buckets)
+            self._phases[phase].observe(duration)
+
+    def observe_pool_wait(self, pool, duration):
+        with self._lock:
+            if pool not in self._pool_waits:
+                self._pool_waits[pool] = Histogram(POOL_WAIT_BUCKETS)
+            self._pool_waits[pool].observe(duration)
+
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines += [f"# HELP {p}_http_requests_total Requests handled.", f"# TYPE {p}_http_requests_total counter"]
+            for (method, endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{p}_http_requests_total{{method="{method}",endpoint="{_label(endpoint)}",status="{status}"}} {count}')
+
+            lines += [f"# HELP {p}_http_request_duration_seconds Request handling time.", f"# TYPE {p}_http_request_duration_seconds histogram"]
+            for (method, endpoint), histogram in sorted(self._durations.items()):
+                lines += histogram.lines(f"{p}_http_request_duration_seconds", f'method="{method}",endpoint="{_label(endpoint)}"')
+
+            lines += [f"# HELP {p}_http_request_queries_total SQL statements run by requests.", f"# TYPE {p}_http_request_queries_total counter"]
+            for (method, endpoint), count in sorted(self._queries.items()):
+                lines.append(f'{p}_http_request_queries_total{{method="{method}",endpoint="{_label(endpoint)}"}} {count}')
+
+            lines += [f"# HELP {p}_http_request_query_seconds_total Time requests spent in SQL statements.", f"# TYPE {p}_http_request_query_seconds_total counter"]
+            for (method, endpoint), seconds in sorted(self._query_time.items()):
+                lines.append(f'{p}_http_request_query_seconds_total{{method="{method}",endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+
+            lines += [f"# HELP {p}_phase_duration_seconds Time spent in instrumented phases.", f"# TYPE {p}_phase_duration_seconds histogram"]
+            for phase, histogram in sorted(self._phases.items()):
+                lines += histogram.lines(f"{p}_phase_duration_seconds", f'phase="{_label(phase)}"')
+
+            lines += [f"# HELP {p}_db_pool_wait_seconds Time to check a connection out of the pool.", f"# TYPE {p}_db_pool_wait_seconds histogram"]
+            for pool, histogram in sorted(self._pool_waits.items()):
+                lines += histogram.lines(f"{p}_db_pool_wait_seconds", f'pool="{_label(pool)}"')
+
+        lines += [f"# HELP {p}_db_pool_connections Connections by pool and state.", f"# TYPE {p}_db_pool_connections gauge"]
+        for name, engine in sorted(self._engines.items()):
+            # Read at scrape time, engine.pool is replaced whenever the engine is disposed
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            for state, count in (("checked_out", pool.checkedout()), ("idle", pool.checkedin()), ("overflow", max(pool.overflow(), 0))):
+                lines.append(f'{p}_db_pool_connections{{pool="{_label(name)}",state="{state}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class _Phase:
+    __slots__ = ("instrumentation", "name", "started")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        self.instrumentation.metrics.observe_phase(self.name, duration)
+        timing = getattr(self.instrumentation._local, "timing", None)
+        if timing is not None:
+            timing.phases[self.name] += duration
+        return False
+
+
+class Instrumentation:
+    """Per-request SQL counts and timings, phase timers, Server-Timing and Prometheus metrics.
+
+    When disabled, init_app installs nothing and phase() hands back a shared
+    no-op context manager, so the only cost is that call.
+
+        instrumentation = Instrumentation(enabled=True)
+        instrumentation.init_app(app, {"primary": engine})
+
+        with instrumentation.phase("matching"):
+            ...
+    """
+
+    def __init__(self, enabled=False, metrics=None):
+        self.enabled = enabled
+        self.metrics = metrics or Metrics()
+        self._local = threading.local()
+        self._noop = nullcontext()
+
+    def init_app(self, app, engines):
+        """engines maps a label ("primary", "replica") to each engine to watch."""
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        for name, engine in engines.items():
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+            self.metrics.add_engine(name, engine)
+            # Only pools that time their checkouts (database.TimedQueuePool) can report waits
+            if hasattr(engine.pool, "wait_listener"):
+                engine.pool.wait_listener = self._pool_wait_listener(name)
+
+    def _pool_wait_listener(self, name):
+        def listener(duration):
+            self.metrics.observe_pool_wait(name, duration)
+            timing = getattr(self._local, "timing", None)
+            if timing is not None:
+                timing.pool_wait += duration
+
+        return listener
+
+    def phase(self, name):
+        if not self.enabled:
+            return self._noop
+        return _Phase(self, name)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("instrumentation_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["instrumentation_started"].pop()
+        timing = getattr(self._local, "timing", None)
+        if timing is not None:
+            timing.queries += 1
+            timing.query_time += time.perf_counter() - started
+
+    def _before_request(self):
+        self._local.timing = RequestTiming()
+
+    def _after_request(self, response):
+        from flask import request
+
+        timing = getattr(self._local, "timing", None)
+        if timing is None:
+            return response
+        self._local.timing = None
+        duration = time.perf_counter() - timing.started
+
+        # The URL rule rather than the path keeps ids out of the labels
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        self.metrics.observe_request(request.method, endpoint, response.status_code, duration, timing.queries, timing.query_time)
+
+        entries = [f'db;dur={timing.query_time * 1000:.2f};desc="{timing.queries} queries"']
+        if timing.pool_wait:
+            entries.append(f"pool;dur={timing.pool_wait * 1000:.2f}")
+        entries += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timing.phases.items()]
+        entries.append(f"total;dur={duration * 1000:.2f}")
+        response.headers.add("Server-Timing", ", ".join(entries))
+        return response
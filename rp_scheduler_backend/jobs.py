@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Background jobs recorded in a table and run by a thread pool in the process that queued them.
+
+    The model needs job_id, kind, active_key (unique, nullable), params, status,
+    result, error, created_at, started_at and finished_at columns. active_key
+    holds the coalescing key while a job is queued or running, so a duplicate
+    request from any worker finds the existing job instead of starting another.
+
+        job_queue = JobQueue(app, db, ScheduleJob, workers=2)
+
+        @job_queue.handler("generate_schedule")
+        def run_generate(date):
+            ...
+
+        job, created = job_queue.submit("generate_schedule", f"generate_schedule:{date}", {"date": date})
+    """
+
+    def __init__(self, app, db, model, workers=2, stale_after=timedelta(minutes=30)):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.stale_after = stale_after
+        self._handlers = {}
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def handler(self, kind):
+        def register(func):
+            self._handlers[kind] = func
+            return func
+
+        return register
+
+    def _get_executor(self):
+        # Created on first use, so with gunicorn's preload each worker gets its own threads after the fork
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def active_job(self, key):
+        return self.model.query.filter_by(active_key=key).first()
+
+    def get(self, job_id):
+        return self.db.session.get(self.model, job_id)
+
+    def _is_stale(self, job):
+        # A worker that died (or was restarted) mid job never clears active_key
+        started = job.started_at or job.created_at
+        return started is not None and datetime.utcnow() - started > self.stale_after
+
+    def submit(self, kind, key, params):
+        """Queue handler(**params) unless a job with the same key is queued or running.
+
+        Returns (job, created); created is False when an existing job was returned.
+        """
+        session = self.db.session
+        existing = self.active_job(key)
+        if existing is not None:
+            if not self._is_stale(existing):
+                return existing, False
+            logging.warning(f"Job {existing.job_id} ({existing.kind}) looks abandoned, queueing a new one")
+            existing.status = FAILED
+            existing.error = "Abandoned"
+            existing.active_key = None
+            existing.finished_at = datetime.utcnow()
+
+        job = self.model(kind=kind, active_key=key, params=json.dumps(params), status=QUEUED, created_at=datetime.utcnow())
+        session.add(job)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            # The same work was queued by another request in between
+            existing = self.active_job(key)
+            if existing is None:
+                raise
+            return existing, False
+
+        self._get_executor().submit(self._run, job.job_id)
+        return job, True
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            session = self.db.session
+            job = session.get(self.model, job_id)
+            try:
+                job.status = RUNNING
+                job.started_at = datetime.utcnow()
+                session.commit()
+                result = self._handlers[job.kind](**json.loads(job.params))
+                job.status = SUCCEEDED
+                job.result = json.dumps(result, default=str)
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Job {job_id} ({job.kind}) failed: {str(e)}")
+                job.status = FAILED
+                job.error = str(e)
+            job.active_key = None
+            job.finished_at = datetime.utcnow()
+            try:
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Could not record the outcome of job {job_id}: {str(e)}")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def job_payload(job):
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params) if job.params else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+# MySQL limits lock names to 64 characters
+MAX_LOCK_NAME = 64
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+class NamedLocks:
+    """Mutual exclusion by name between threads of this process and, on MySQL and
+    PostgreSQL, between processes through database advisory locks.
+
+    Advisory locks are held on a dedicated connection for the duration of the
+    block and are released explicitly; if that fails the connection is
+    invalidated, which drops its session and every lock with it. Other
+    databases (SQLite in development) only get the in-process locks.
+
+        locks = NamedLocks("rp_scheduler")
+        with locks.hold(engine, ["schedule:2024-03-04"], timeout=30):
+            ...
+    """
+
+    def __init__(self, prefix, timeout=60.0, poll_interval=0.05):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._guard = threading.Lock()
+        # name -> [lock, holders and waiters], dropped once nobody uses it
+        self._local = {}
+
+    def _full_name(self, name):
+        full_name = f"{self.prefix}:{name}"
+        if len(full_name) > MAX_LOCK_NAME:
+            raise ValueError(f"Lock name {full_name!r} is longer than {MAX_LOCK_NAME} characters")
+        return full_name
+
+    def _local_lock(self, name):
+        with self._guard:
+            entry = self._local.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _forget_local_lock(self, name):
+        with self._guard:
+            entry = self._local[name]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._local[name]
+
+    def _acquire_advisory(self, connection, backend, name, deadline):
+        if backend == "mysql":
+            # GET_LOCK waits by itself; 1 means acquired, 0 timed out, NULL an error
+            seconds = max(int(deadline - time.monotonic() + 0.999), 0)
+            return connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": seconds}).scalar() == 1
+        while True:
+            if connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": name}).scalar():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def _release_advisory(self, connection, backend, name):
+        if backend == "mysql":
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+        else:
+            connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+
+    @contextmanager
+    def hold(self, engine, names, timeout=None):
+        """Hold every lock in names, raising LockTimeout if they can't all be had within timeout seconds."""
+        # A fixed order keeps two holders of overlapping sets from deadlocking
+        names = sorted({self._full_name(name) for name in names})
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        backend = engine.dialect.name
+        held_local = []
+        held_advisory = []
+        connection = None
+        try:
+            for name in names:
+                lock = self._local_lock(name)
+                if not lock.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                    self._forget_local_lock(name)
+                    raise LockTimeout(f"Timed out waiting for {name}")
+                held_local.append((name, lock))
+
+            if backend in ("mysql", "postgresql"):
+                connection = engine.connect()
+                for name in names:
+                    if not self._acquire_advisory(connection, backend, name, deadline):
+                        raise LockTimeout(f"Timed out waiting for {name}")
+                    held_advisory.append(name)
+            yield
+        finally:
+            if connection is not None:
+                try:
+                    for name in reversed(held_advisory):
+                        self._release_advisory(connection, backend, name)
+                    connection.commit()
+                except Exception:
+                    connection.invalidate()
+                connection.close()
+            for name, lock in reversed(held_local):
+                lock.release()
+                self._forget_local_lock(name)
@@ -0,0 +1,720 @@
+import bisect
+import heapq
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from datetime import date
+
+import numpy as np
+
+DAYS_IN_WEEK = 7
+
+SOLVERS = ("greedy", "blossom", "weighted")
+
+# "window" never repeats a pairing inside the window; "recency" prefers the pairs
+# that met longest ago instead, see plan_week
+PAIRING_MODES = ("window", "recency")
+
+# Weight of a pair with no pairing on record (two years, in weeks)
+NEVER_PAIRED_WEIGHT = 104
+
+# PairRecency stores dates as days after this, leaving 0 for pairs never paired
+RECENCY_EPOCH = date(2000, 1, 1)
+
+
+def pair_positions(ids_array, pairs, with_kept=False):
+    """Row indexes in ids_array (float agent_ids) for (agent_id, agent_id) pairs.
+
+    Vectorized lookup; pairs with an agent that is not in ids_array are dropped.
+    with_kept also returns the boolean mask of the pairs that were kept.
+    """
+    pairs = np.array(list(pairs), dtype=np.float64).reshape(-1, 2)
+    positions = np.full(pairs.shape, -1, dtype=np.intp)
+    if len(ids_array):
+        order = np.argsort(ids_array, kind="stable")
+        sorted_ids = ids_array[order]
+        found = np.minimum(np.searchsorted(sorted_ids, pairs), len(sorted_ids) - 1)
+        hit = sorted_ids[found] == pairs
+        positions[hit] = order[found[hit]]
+    keep = (positions >= 0).all(axis=1)
+    if with_kept:
+        return positions[keep, 0], positions[keep, 1], keep
+    return positions[keep, 0], positions[keep, 1]
+
+
+def partner_sets(agent_ids, matrix):
+    # agent_id -> set of agent_ids from a boolean adjacency matrix, skipping agents with no partner
+    ids_array = np.array(agent_ids, dtype=object)
+    agent_to_partners = defaultdict(set)
+    for i in np.flatnonzero(matrix.any(axis=1)).tolist():
+        agent_to_partners[agent_ids[i]] = set(ids_array[matrix[i]].tolist())
+    return agent_to_partners
+
+
+class CompatibilityEngine:
+    """Candidate pair graph for one week, built with bitset operations.
+
+    Each agent's week is a 7-bit mask, so two agents share a day when their masks
+    AND to non-zero. Exclusions (blacklist, recent pairings) and the resulting
+    adjacency are kept as packed n x ceil(n/8) bitsets.
+    """
+
+    def __init__(self, agent_ids, masks):
+        self.agent_ids = list(agent_ids)
+        self.index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+        self.masks = np.asarray(masks, dtype=np.uint8).reshape(len(self.agent_ids))
+        # float so that a missing (None) agent becomes NaN and simply never matches
+        self._ids_array = np.array(self.agent_ids, dtype=np.float64)
+        n = len(self.agent_ids)
+        self.excluded = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+        # An agent can never be paired with themselves
+        self._set_bits(np.arange(n), np.arange(n))
+
+    def _set_bits(self, rows, cols):
+        np.bitwise_or.at(self.excluded, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+
+    def _pair_indexes(self, pairs):
+        return pair_positions(self._ids_array, pairs)
+
+    def exclude(self, pairs):
+        """Exclude (agent_id, agent_id) pairs in either order; unknown agents are ignored."""
+        rows, cols = self._pair_indexes(pairs)
+        self._set_bits(rows, cols)
+        self._set_bits(cols, rows)
+
+    def _day_bitsets(self):
+        # Row d is the packed set of agents available on day offset d
+        days = ((self.masks[None, :] >> np.arange(DAYS_IN_WEEK, dtype=np.uint8)[:, None]) & 1).astype(bool)
+        return np.packbits(days, axis=1)
+
+    def adjacency(self):
+        """Packed adjacency: bit j of row i is set when i and j can be paired."""
+        n = len(self.agent_ids)
+        if n == 0:
+            return self.excluded.copy()
+
+        # At most 128 distinct masks, so the shared-day rows are computed once per mask
+        day_bitsets = self._day_bitsets()
+        unique_masks, inverse = np.unique(self.masks, return_inverse=True)
+        shared = np.zeros((len(unique_masks), self.excluded.shape[1]), dtype=np.uint8)
+        for u, mask in enumerate(unique_masks):
+            for day_offset in range(DAYS_IN_WEEK):
+                if mask >> day_offset & 1:
+                    shared[u] |= day_bitsets[day_offset]
+
+        return shared[inverse.reshape(-1)] & ~self.excluded
+
+    def adjacency_matrix(self):
+        n = len(self.agent_ids)
+        return np.unpackbits(self.adjacency(), axis=1, count=n).astype(bool)
+
+    def candidate_pairs(self):
+        """(agent_id, agent_id) candidate pairs, each pair once with the lower index first."""
+        rows, cols = np.nonzero(np.triu(self.adjacency_matrix(), k=1))
+        agent_ids = self.agent_ids
+        return [(agent_ids[i], agent_ids[j]) for i, j in zip(rows.tolist(), cols.tolist())]
+
+    def partners(self):
+        """agent_id -> set of compatible agent_ids, only for agents with at least one partner."""
+        return partner_sets(self.agent_ids, self.adjacency_matrix())
+
+
+class CandidateGraph:
+    """Candidate pair graph that is kept up to date from deltas instead of rebuilt.
+
+    Holds the week masks, blacklist and per-pair counts of pairings inside the
+    current window for a fixed set of agents, plus the boolean adjacency they
+    imply. Each update only recomputes the rows or cells it touches.
+    """
+
+    def __init__(self, agent_ids, masks, blacklisted_pairs=(), pairings=()):
+        self.agent_ids = list(agent_ids)
+        self.index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+        self._ids_array = np.array(self.agent_ids, dtype=np.float64)
+        n = len(self.agent_ids)
+        self.masks = np.array(masks, dtype=np.uint8).reshape(n)
+        self.blacklisted = np.zeros((n, n), dtype=bool)
+        self.pair_counts = np.zeros((n, n), dtype=np.uint16)
+
+        rows, cols = pair_positions(self._ids_array, blacklisted_pairs)
+        self.blacklisted[rows, cols] = self.blacklisted[cols, rows] = True
+        rows, cols = pair_positions(self._ids_array, pairings)
+        np.add.at(self.pair_counts, (rows, cols), 1)
+        np.add.at(self.pair_counts, (cols, rows), 1)
+
+        # The initial build is a full CompatibilityEngine pass
+        engine = CompatibilityEngine(self.agent_ids, self.masks)
+        engine.exclude(blacklisted_pairs)
+        engine.exclude(pairings)
+        self.adjacency = engine.adjacency_matrix()
+
+    def _refresh_rows(self, rows):
+        if not len(rows):
+            return
+        shared = (self.masks[rows, None] & self.masks[None, :]) != 0
+        values = shared & ~self.blacklisted[rows] & (self.pair_counts[rows] == 0)
+        values[np.arange(len(rows)), rows] = False
+        self.adjacency[rows, :] = values
+        self.adjacency[:, rows] = values.T
+
+    def _refresh_cells(self, rows, cols):
+        values = ((self.masks[rows] & self.masks[cols]) != 0) & ~self.blacklisted[rows, cols] & (self.pair_counts[rows, cols] == 0)
+        values &= rows != cols
+        self.adjacency[rows, cols] = values
+        self.adjacency[cols, rows] = values
+
+    def update_masks(self, masks):
+        """Set new week masks (in agent_ids order), recomputing only agents whose mask changed."""
+        masks = np.asarray(masks, dtype=np.uint8).reshape(len(self.agent_ids))
+        changed = np.flatnonzero(masks != self.masks)
+        self.masks = masks.copy()
+        self._refresh_rows(changed)
+        return len(changed)
+
+    def add_blacklist(self, pairs):
+        rows, cols = pair_positions(self._ids_array, pairs)
+        self.blacklisted[rows, cols] = self.blacklisted[cols, rows] = True
+        self._refresh_cells(rows, cols)
+
+    def remove_blacklist(self, pairs):
+        rows, cols = pair_positions(self._ids_array, pairs)
+        self.blacklisted[rows, cols] = self.blacklisted[cols, rows] = False
+        self._refresh_cells(rows, cols)
+
+    def add_pairings(self, pairs):
+        """Count pairings that entered the window; each one blocks its pair."""
+        rows, cols = pair_positions(self._ids_array, pairs)
+        np.add.at(self.pair_counts, (rows, cols), 1)
+        np.add.at(self.pair_counts, (cols, rows), 1)
+        self._refresh_cells(rows, cols)
+
+    def remove_pairings(self, pairs):
+        """Forget pairings that left the window; a pair unblocks once its count reaches zero."""
+        rows, cols = pair_positions(self._ids_array, pairs)
+        np.subtract.at(self.pair_counts, (rows, cols), 1)
+        np.subtract.at(self.pair_counts, (cols, rows), 1)
+        self._refresh_cells(rows, cols)
+
+    def submatrix(self, agent_ids):
+        """Boolean adjacency between agent_ids, in that order; what the solvers take.
+
+        A numpy copy of the rows and columns, so the weekly cost stays a few
+        milliseconds instead of growing with the number of candidate pairs.
+        """
+        rows = np.array([self.index[agent_id] for agent_id in agent_ids], dtype=np.intp)
+        return self.adjacency[np.ix_(rows, rows)]
+
+    def partners(self, agent_ids=None):
+        """agent_id -> set of compatible agent_ids, restricted to agent_ids when given."""
+        if agent_ids is None:
+            return partner_sets(self.agent_ids, self.adjacency)
+        agent_ids = list(agent_ids)
+        return partner_sets(agent_ids, self.submatrix(agent_ids))
+
+    def mismatches(self, blacklisted_pairs, pairings):
+        """Compare with a full CompatibilityEngine rebuild; returns the (agent_id, agent_id) pairs that differ."""
+        engine = CompatibilityEngine(self.agent_ids, self.masks)
+        engine.exclude(blacklisted_pairs)
+        engine.exclude(pairings)
+        rows, cols = np.nonzero(np.triu(engine.adjacency_matrix() != self.adjacency, k=1))
+        return [(self.agent_ids[i], self.agent_ids[j]) for i, j in zip(rows.tolist(), cols.tolist())]
+
+
+class PairRecency:
+    """Dates of the pairings of every pair of agents nearest to the weeks being generated.
+
+    last_day holds each pair's latest pairing before those weeks and next_day
+    its earliest pairing after them, as n x n matrices, so a week in the middle
+    of an already planned range is weighed against its neighbours on both sides
+    like the +/- window it replaces. Built once from the pairing history and
+    kept current with record as weeks are generated in order, so the weights
+    for a week are a vectorized lookup rather than a pass over the history.
+    Dates are uint16 days after RECENCY_EPOCH, with 0 (last_day) and
+    NO_PAIRING_AFTER (next_day) for none, 4 MB for 1000 agents.
+    """
+
+    NO_PAIRING_AFTER = np.iinfo(np.uint16).max
+
+    def __init__(self, agent_ids, last_paired=(), next_paired=()):
+        self.agent_ids = list(agent_ids)
+        self.index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+        self._ids_array = np.array(self.agent_ids, dtype=np.float64)
+        n = len(self.agent_ids)
+        self.last_day = np.zeros((n, n), dtype=np.uint16)
+        self.next_day = np.full((n, n), self.NO_PAIRING_AFTER, dtype=np.uint16)
+        last_paired = list(last_paired)
+        next_paired = list(next_paired)
+        self._set(self.last_day, np.maximum, [(agent1_id, agent2_id) for agent1_id, agent2_id, _ in last_paired], [self._day(paired_date) for _, _, paired_date in last_paired])
+        self._set(self.next_day, np.minimum, [(agent1_id, agent2_id) for agent1_id, agent2_id, _ in next_paired], [self._day(paired_date) for _, _, paired_date in next_paired])
+
+    @classmethod
+    def _day(cls, paired_date):
+        return min(max((paired_date - RECENCY_EPOCH).days + 1, 1), cls.NO_PAIRING_AFTER - 1)
+
+    def _set(self, matrix, keep, pairs, days):
+        rows, cols, kept = pair_positions(self._ids_array, pairs, with_kept=True)
+        days = np.asarray(days, dtype=np.uint16).reshape(-1)[kept]
+        # A pair listed more than once keeps the date keep (maximum or minimum) picks
+        keep.at(matrix, (rows, cols), days)
+        keep.at(matrix, (cols, rows), days)
+
+    def record(self, pairs, paired_date):
+        """Add a generated week; weeks must be recorded in order, each before the next one planned."""
+        pairs = list(pairs)
+        self._set(self.last_day, np.maximum, pairs, [self._day(paired_date)] * len(pairs))
+
+    def _positions(self, pairs):
+        rows = np.array([self.index[agent1_id] for agent1_id, _ in pairs], dtype=np.intp)
+        cols = np.array([self.index[agent2_id] for _, agent2_id in pairs], dtype=np.intp)
+        return rows, cols
+
+    def _weeks_apart(self, day, last_day, next_day):
+        last_day = last_day.astype(np.int32)
+        next_day = next_day.astype(np.int32)
+        never = NEVER_PAIRED_WEIGHT * DAYS_IN_WEEK
+        before = np.where(last_day > 0, np.abs(day - last_day), never)
+        after = np.where(next_day != self.NO_PAIRING_AFTER, np.abs(next_day - day), never)
+        return np.minimum(np.minimum(before, after) // DAYS_IN_WEEK, NEVER_PAIRED_WEIGHT).astype(np.uint8)
+
+    def weeks_apart(self, monday_date, pairs):
+        """Whole weeks between monday_date and each pair's nearest pairing on either side, NEVER_PAIRED_WEIGHT at most."""
+        positions = self._positions(pairs)
+        return self._weeks_apart(self._day(monday_date), self.last_day[positions], self.next_day[positions])
+
+    def days_since(self, monday_date, pairs):
+        """Days from each pair's latest pairing before monday_date, None for pairs not paired before it."""
+        days = self._day(monday_date) - self.last_day[self._positions(pairs)].astype(np.int64)
+        return [gap if 0 < gap < self._day(monday_date) else None for gap in days.tolist()]
+
+    def pair_weights(self, monday_date, agent_ids, block_rows=512):
+        """weeks_apart between all of agent_ids as a uint8 matrix in agent_ids order.
+
+        Computed block_rows rows at a time to keep the int32 temporaries small.
+        """
+        rows = np.array([self.index[agent_id] for agent_id in agent_ids], dtype=np.intp)
+        day = self._day(monday_date)
+        weights = np.empty((len(rows), len(rows)), dtype=np.uint8)
+        for start in range(0, len(rows), block_rows):
+            block = np.ix_(rows[start : start + block_rows], rows)
+            weights[start : start + block_rows] = self._weeks_apart(day, self.last_day[block], self.next_day[block])
+        return weights
+
+
+class SchedulingState:
+    """Inputs create_schedule needs, loaded once and shared across consecutive weeks.
+
+    availability is an availability.AvailabilityCalendar covering the weeks,
+    past_pairings holds (agent1_id, agent2_id, date) for paired schedule details
+    inside the window, sorted by date, and recency a PairRecency of the rest of
+    the history (weighted solver and recency mode only). record_pairings feeds a generated week back in so the
+    following weeks see it, and candidate_graph keeps one CandidateGraph that is
+    moved from week to week by deltas. With check_graph every incremental update
+    is compared against a full rebuild.
+    """
+
+    def __init__(self, agent_ids, availability, blacklisted_pairs, past_pairings, recency=None, check_graph=False):
+        self.agent_ids = list(agent_ids)
+        self.availability = availability
+        self.blacklisted_pairs = blacklisted_pairs
+        self.past_pairings = sorted(past_pairings, key=lambda pairing: pairing[2])
+        self._pairing_dates = [paired_date for _, _, paired_date in self.past_pairings]
+        self.recency = recency
+        self.check_graph = check_graph
+        self._graph = None
+        self._window = None
+
+    def _window_slice(self, window_start, window_end):
+        # Exclusive on both ends, like the original Schedule.date window query; an empty
+        # window (recency mode) must still give start <= end for the deltas below
+        start = bisect.bisect_right(self._pairing_dates, window_start)
+        return start, max(start, bisect.bisect_left(self._pairing_dates, window_end))
+
+    def _pairs(self, start, end):
+        return [(agent1_id, agent2_id) for agent1_id, agent2_id, _ in self.past_pairings[start:end]]
+
+    def pairings_within(self, window_start, window_end):
+        return set(self._pairs(*self._window_slice(window_start, window_end)))
+
+    def pair_weights(self, monday_date, agent_ids):
+        # Without a recency matrix every pair counts as never paired
+        if self.recency is None:
+            return np.full((len(agent_ids), len(agent_ids)), NEVER_PAIRED_WEIGHT, dtype=np.uint8)
+        return self.recency.pair_weights(monday_date, agent_ids)
+
+    def candidate_graph(self, window_start, window_end, masks):
+        """The candidate graph for a week's masks and pairing window, updated from the previous call."""
+        # Pair counts must see every pairing in the window, duplicates included, so
+        # that the same pairings can later be subtracted again one by one
+        if self._graph is None:
+            self._graph = CandidateGraph(self.agent_ids, masks, self.blacklisted_pairs, self._pairs(*self._window_slice(window_start, window_end)))
+        else:
+            changed = self._graph.update_masks(masks)
+            old_start, old_end = self._window_slice(*self._window)
+            new_start, new_end = self._window_slice(window_start, window_end)
+            # Pairings in the old window but not the new one leave, and the reverse enter
+            leaving = self._pairs(old_start, min(old_end, new_start)) + self._pairs(max(old_start, new_end), old_end)
+            entering = self._pairs(new_start, min(new_end, old_start)) + self._pairs(max(new_start, old_end), new_end)
+            self._graph.remove_pairings(leaving)
+            self._graph.add_pairings(entering)
+            logging.debug(f"Candidate graph delta: {changed} masks, {len(leaving)} pairings left, {len(entering)} entered")
+        self._window = (window_start, window_end)
+
+        if self.check_graph:
+            mismatches = self._graph.mismatches(self.blacklisted_pairs, self.pairings_within(window_start, window_end))
+            if mismatches:
+                logging.error(f"Candidate graph differs from a full rebuild on {len(mismatches)} pairs: {mismatches[:10]}")
+                self._graph = CandidateGraph(self.agent_ids, masks, self.blacklisted_pairs, self._pairs(*self._window_slice(window_start, window_end)))
+        return self._graph
+
+    def _in_window(self, paired_date):
+        return self._window is not None and self._window[0] < paired_date < self._window[1]
+
+    def record_pairings(self, monday_date, pairings):
+        pairings = list(pairings)
+        position = bisect.bisect_right(self._pairing_dates, monday_date)
+        self.past_pairings[position:position] = [(agent1_id, agent2_id, monday_date) for agent1_id, agent2_id in pairings]
+        self._pairing_dates[position:position] = [monday_date] * len(pairings)
+        if self._graph is not None and self._in_window(monday_date):
+            self._graph.add_pairings(pairings)
+        if self.recency is not None:
+            self.recency.record(pairings, monday_date)
+
+    def discard_pairings(self, monday_date):
+        """Drop a week's pairings again, e.g. before regenerating that week from this state.
+
+        recency keeps the dropped date; it only feeds preferences, never exclusions.
+        """
+        start = bisect.bisect_left(self._pairing_dates, monday_date)
+        end = bisect.bisect_right(self._pairing_dates, monday_date)
+        removed = self._pairs(start, end)
+        del self.past_pairings[start:end]
+        del self._pairing_dates[start:end]
+        if self._graph is not None and self._in_window(monday_date):
+            self._graph.remove_pairings(removed)
+        return removed
+
+
+class MatchingResult:
+    def __init__(self, solver, pairings, unmatched, solve_time, complete=True):
+        self.solver = solver
+        self.pairings = pairings
+        self.unmatched = unmatched
+        self.solve_time = solve_time
+        # False when the time budget ran out before the solver proved its matching optimal
+        self.complete = complete
+
+    def stats(self):
+        return {
+            "solver": self.solver,
+            "matched": 2 * len(self.pairings),
+            "unmatched": len(self.unmatched),
+            "solve_time_ms": round(self.solve_time * 1000, 3),
+            "complete": self.complete,
+        }
+
+
+def greedy_matching(agent_ids, adjacency, rng=None, pair_weights=None):
+    """Most-constrained-first greedy pairing on a boolean adjacency matrix in agent_ids order.
+
+    Each step pairs the agent with the fewest unpaired partners left. Ties go
+    to the lowest agent_id and the partner is the first in agent_ids order;
+    with a random.Random as rng both are picked at random instead, for
+    alternative schedules. With pair_weights (a matrix like adjacency) only the
+    heaviest partners are considered. Every step is a few vector operations,
+    so there is no per-pair Python work.
+    """
+    n = len(agent_ids)
+    selected_pairings = []
+    if n == 0:
+        return selected_pairings, set()
+
+    if rng is None:
+        tiebreak = np.argsort(np.argsort(np.array(agent_ids), kind="stable"))
+    else:
+        ranks = list(range(n))
+        rng.shuffle(ranks)
+        tiebreak = np.array(ranks)
+    unpaired = np.ones(n, dtype=bool)
+    # Unpaired partners left per agent
+    degrees = adjacency.sum(axis=1, dtype=np.int64)
+    no_choice = np.iinfo(np.int64).max
+
+    while True:
+        # Remove the most constrained agent
+        keys = np.where(unpaired & (degrees > 0), degrees * n + tiebreak, no_choice)
+        i = int(keys.argmin())
+        if keys[i] == no_choice:
+            break
+
+        partners = np.flatnonzero(adjacency[i] & unpaired)
+        if pair_weights is not None:
+            weights = pair_weights[i, partners]
+            partners = partners[weights == weights.max()]
+        j = int(partners[rng.randrange(len(partners))]) if rng is not None else int(partners[0])
+
+        logging.debug(f"Pairing agents: {agent_ids[i]}, {agent_ids[j]}")
+        selected_pairings.append((agent_ids[i], agent_ids[j]))
+        unpaired[i] = unpaired[j] = False
+        degrees -= adjacency[i]
+        degrees -= adjacency[j]
+
+    return selected_pairings, {agent_ids[i] for i in np.flatnonzero(unpaired).tolist()}
+
+
+class _NeighbourLists:
+    # Row i of a boolean adjacency matrix as a list of indexes, built the first time it is read
+    def __init__(self, adjacency):
+        self.adjacency = adjacency
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def __getitem__(self, i):
+        row = self._rows.get(i)
+        if row is None:
+            row = self._rows[i] = np.flatnonzero(self.adjacency[i]).tolist()
+        return row
+
+
+def _blossom_augmenting_path(root, graph, match):
+    # Edmonds' blossom search from one exposed vertex. Returns the exposed
+    # vertex at the far end of an augmenting path (with parent links set), or -1.
+    n = len(graph)
+    used = [False] * n
+    parent = [-1] * n
+    base = list(range(n))
+
+    def lowest_common_ancestor(a, b):
+        seen = [False] * n
+        while True:
+            a = base[a]
+            seen[a] = True
+            if match[a] == -1:
+                break
+            a = parent[match[a]]
+        while True:
+            b = base[b]
+            if seen[b]:
+                return b
+            b = parent[match[b]]
+
+    def mark_path(v, blossom_base, child, blossom):
+        while base[v] != blossom_base:
+            blossom[base[v]] = blossom[base[match[v]]] = True
+            parent[v] = child
+            child = match[v]
+            v = parent[match[v]]
+
+    used[root] = True
+    queue = deque([root])
+    while queue:
+        v = queue.popleft()
+        for to in graph[v]:
+            if base[v] == base[to] or match[v] == to:
+                continue
+            if to == root or (match[to] != -1 and parent[match[to]] != -1):
+                # Odd cycle: contract the blossom onto its base
+                blossom_base = lowest_common_ancestor(v, to)
+                blossom = [False] * n
+                mark_path(v, blossom_base, to, blossom)
+                mark_path(to, blossom_base, v, blossom)
+                for i in range(n):
+                    if blossom[base[i]]:
+                        base[i] = blossom_base
+                        if not used[i]:
+                            used[i] = True
+                            queue.append(i)
+            elif parent[to] == -1:
+                parent[to] = v
+                if match[to] == -1:
+                    return to, parent
+                used[match[to]] = True
+                queue.append(match[to])
+    return -1, parent
+
+
+def blossom_matching(agent_ids, adjacency, initial_pairings=(), deadline=None):
+    """Maximum-cardinality matching (Edmonds' blossom), grown from initial_pairings.
+
+    adjacency is a boolean matrix in agent_ids order; only the rows the
+    searches reach are turned into neighbour lists. Stops early once
+    time.perf_counter() passes deadline; the matching returned is then valid
+    but possibly not maximum. Returns (pairings, unpaired, complete).
+    """
+    index = {agent_id: i for i, agent_id in enumerate(agent_ids)}
+    graph = _NeighbourLists(adjacency)
+    match = [-1] * len(agent_ids)
+    for agent1_id, agent2_id in initial_pairings:
+        match[index[agent1_id]] = index[agent2_id]
+        match[index[agent2_id]] = index[agent1_id]
+
+    complete = True
+    for root in range(len(agent_ids)):
+        if match[root] != -1 or not graph[root]:
+            continue
+        if deadline is not None and time.perf_counter() > deadline:
+            complete = False
+            break
+        # A vertex with no augmenting path now never gets one later, so one pass suffices
+        v, parent = _blossom_augmenting_path(root, graph, match)
+        while v != -1:
+            pv = parent[v]
+            ppv = match[pv]
+            match[v] = pv
+            match[pv] = v
+            v = ppv
+
+    pairings = [(agent_ids[i], agent_ids[j]) for i, j in enumerate(match) if j != -1 and i < j]
+    unpaired = {agent_ids[i] for i, j in enumerate(match) if j == -1}
+    return pairings, unpaired, complete
+
+
+def weighted_matching(agent_ids, adjacency, pair_weights=None):
+    """Maximum-cardinality matching that maximizes the total weight of the chosen pairs.
+
+    pair_weights is a matrix like adjacency; without it every pair weighs
+    NEVER_PAIRED_WEIGHT. Uses networkx's blossom implementation, which cannot be interrupted.
+    """
+    import networkx as nx
+
+    rows, cols = np.nonzero(np.triu(adjacency, k=1))
+    weights = pair_weights[rows, cols].tolist() if pair_weights is not None else [NEVER_PAIRED_WEIGHT] * len(rows)
+    graph = nx.Graph()
+    graph.add_nodes_from(agent_ids)
+    graph.add_weighted_edges_from((agent_ids[i], agent_ids[j], weight) for i, j, weight in zip(rows.tolist(), cols.tolist(), weights))
+
+    pairings = [tuple(pair) for pair in nx.max_weight_matching(graph, maxcardinality=True)]
+    matched = {agent_id for pair in pairings for agent_id in pair}
+    return pairings, set(agent_ids) - matched
+
+
+def solve_pairing(agent_ids, adjacency, solver="greedy", time_budget=None, pair_weights=None, rng=None):
+    """Pair agent_ids using the chosen solver and report how it went.
+
+    adjacency is a boolean matrix in agent_ids order (CandidateGraph.submatrix)
+    and pair_weights, when given, a numeric one like it. rng and pair_weights
+    steer the greedy pass (and so the matching blossom grows from), see greedy_matching.
+
+    greedy is the fast default. blossom starts from the greedy result and
+    augments it to a maximum matching within time_budget seconds. weighted
+    also finds a maximum matching but maximizes the total of pair_weights.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver!r}, expected one of {', '.join(SOLVERS)}")
+
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else None
+    complete = True
+
+    if solver == "weighted":
+        pairings, unpaired = weighted_matching(agent_ids, adjacency, pair_weights)
+        complete = deadline is None or time.perf_counter() <= deadline
+    else:
+        pairings, unpaired = greedy_matching(agent_ids, adjacency, rng, pair_weights)
+        if solver == "blossom":
+            pairings, unpaired, complete = blossom_matching(agent_ids, adjacency, pairings, deadline)
+
+    result = MatchingResult(solver, pairings, unpaired, time.perf_counter() - start, complete)
+    logging.debug(f"Pairing solver stats: {result.stats()}")
+    return result
+
+
+def plan_week(state, monday_date, window, solver="greedy", time_budget=None, rng=None, phase=None, mode="window"):
+    """Pair the agents available in the week starting on monday_date.
+
+    Pairings within window (a timedelta or relativedelta, empty for none)
+    either side of the week are excluded. In recency mode the solver also
+    prefers the pairs whose nearest pairing is furthest away (state.recency), so a
+    short or empty window can replace the hard one without pairing the same
+    agents again and again. Reads only state, so it can run in another process
+    on a pickled copy. phase(name) wraps each step, e.g. Instrumentation.phase.
+    Returns (pairings, unpaired agent ids, stats).
+    """
+    if mode not in PAIRING_MODES:
+        raise ValueError(f"Unknown pairing mode {mode!r}, expected one of {', '.join(PAIRING_MODES)}")
+    phase = phase or (lambda name: nullcontext())
+    chooser = rng or random
+    logging.debug(f"Creating schedule for week starting on {monday_date}")
+    with phase("schedule_availability"):
+        week_availability = state.availability.week(monday_date, state.agent_ids)
+        available_ids = set(week_availability.available_agent_ids())
+
+    active_agents = state.agent_ids
+    logging.debug(f"Active agents: {len(active_agents)}")
+
+    unavailable_agents = [agent_id for agent_id in active_agents if agent_id not in available_ids]
+    logging.debug(f"Unavailable agents: {len(unavailable_agents)}")
+
+    active_agents = [agent_id for agent_id in active_agents if agent_id in available_ids]
+    logging.debug(f"Filtered active agents: {len(active_agents)}")
+
+    removed_agent = None
+    # The matching solvers leave an agent unpaired themselves when the count is odd
+    if solver == "greedy" and len(active_agents) % 2 == 1:
+        removed_agent = chooser.choice(active_agents)
+        logging.debug(f"Removing agent {removed_agent} to make even pairs")
+        active_agents.remove(removed_agent)
+
+    logging.debug(f"Blacklisted pairs: {len(state.blacklisted_pairs)}")
+
+    with phase("schedule_candidates"):
+        # Moves the state's candidate graph to this week, only touching what changed since the last week
+        candidate_graph = state.candidate_graph(monday_date - window, monday_date + window, week_availability.masks)
+        adjacency = candidate_graph.submatrix(active_agents)
+    logging.debug(f"Available pairings: {int(adjacency.sum()) // 2}")
+
+    with phase("schedule_matching"):
+        pair_weights = state.pair_weights(monday_date, active_agents) if solver == "weighted" or mode == "recency" else None
+        result = solve_pairing(active_agents, adjacency, solver, time_budget, pair_weights, rng)
+    selected_pairings = result.pairings
+    unpaired_agents = result.unmatched
+    logging.info(f"Schedule for {monday_date} solved: {result.stats()}")
+
+    unpaired_agents_list = list(unpaired_agents)
+    if removed_agent is not None:
+        unpaired_agents_list.append(removed_agent)
+
+    unpaired_agents_list.extend(unavailable_agents)
+
+    logging.debug(f"Selected pairings: {len(selected_pairings)}, unpaired agents: {len(unpaired_agents_list)}")
+
+    stats = result.stats()
+    # Also counts the agent set aside for an odd count and agents unavailable all week
+    stats["unpaired_total"] = len(unpaired_agents_list)
+    stats["mode"] = mode
+    if pair_weights is not None:
+        # The total the weighted solver maximizes, in weeks to each pair's nearest pairing
+        index = {agent_id: i for i, agent_id in enumerate(active_agents)}
+        stats["recency_weeks"] = int(sum(int(pair_weights[index[agent1_id], index[agent2_id]]) for agent1_id, agent2_id in selected_pairings))
+    return selected_pairings, unpaired_agents_list, stats
+
+
+def candidate_metrics(state, monday_date, pairings, unpaired):
+    """Quality of one candidate week; needs state.recency (see load_scheduling_state)."""
+    gaps = []
+    if state.recency is not None and pairings:
+        gaps = [gap for gap in state.recency.days_since(monday_date, pairings) if gap is not None]
+    return {
+        "pairs": len(pairings),
+        "unpaired_total": len(unpaired),
+        # Over the pairs that were paired before; first pairings are counted separately
+        "avg_days_since_last_pairing": round(sum(gaps) / len(gaps), 1) if gaps else None,
+        "first_pairings": len(pairings) - len(gaps),
+    }
+
+
+def preview_candidate(state, monday_date, window, solver, time_budget, seed, mode="window"):
+    """One dry-run schedule: plan_week with a seeded rng plus candidate_metrics. Runs in worker processes."""
+    rng = random.Random(seed) if seed is not None else None
+    pairings, unpaired, stats = plan_week(state, monday_date, window, solver, time_budget, rng, mode=mode)
+    return {
+        "solver": solver,
+        "seed": seed,
+        "pairings": pairings,
+        "unpaired": unpaired,
+        "stats": stats,
+        "metrics": candidate_metrics(state, monday_date, pairings, unpaired),
+    }
@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+# Minimum trigram similarity for a typo-tolerant match (pg_trgm uses the same default)
+FUZZY_THRESHOLD = 0.3
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+FUZZY_WEIGHT = 0.8
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    return (text or "").strip().lower()
+
+
+def trigrams(token):
+    # Padded like pg_trgm so short tokens and word starts still produce grams
+    padded = f"  {token} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def agent_tokens(agent):
+    tokens = set()
+    for field in ("first_name", "last_name"):
+        value = normalize(agent.get(field))
+        if value:
+            tokens.add(value)
+    email = normalize(agent.get("email"))
+    if email:
+        tokens.add(email)
+        tokens.update(part for part in _TOKEN_SPLIT.split(email) if part)
+    phone = re.sub(r"\D", "", agent.get("phone_number") or "")
+    if phone:
+        # Phones are usually looked up by their last four digits
+        tokens.update((phone, phone[-4:]))
+    return tokens
+
+
+def fuzzy_matchable(token):
+    # Typos are only tolerated in words; emails and numbers must match a prefix
+    return "@" not in token and not token.isdigit()
+
+
+def query_terms(query):
+    terms = []
+    for term in normalize(query).split():
+        digits = re.sub(r"\D", "", term)
+        # Phone numbers are indexed as bare digits, so "555-123" searches like "555123"
+        terms.append(digits if digits and not re.search(r"[a-z]", term) else term)
+    return terms
+
+
+class AgentSearchIndex:
+    """In-process agent search over name, email and phone.
+
+    Every term of the query has to match one of an agent's tokens, either
+    exactly, as a prefix, or by trigram similarity to tolerate typos. Results
+    are ranked by the average term score, then by the matched tokens and
+    name. Agents are plain dicts with the agent columns.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.built_at = None
+
+    def _reset(self):
+        self._agents = {}
+        self._agent_tokens = {}
+        self._token_agents = defaultdict(set)
+        self._token_grams = {}
+        self._trigram_tokens = defaultdict(set)
+        self._sorted_tokens = []
+
+    def __len__(self):
+        return len(self._agents)
+
+    def rebuild(self, agents):
+        with self._lock:
+            self._reset()
+            for agent in agents:
+                self._add(dict(agent), keep_sorted=False)
+            self._sorted_tokens = sorted(self._token_agents)
+            self.built_at = time.monotonic()
+
+    def is_stale(self, max_age):
+        return self.built_at is None or time.monotonic() - self.built_at >= max_age
+
+    def upsert(self, agent):
+        with self._lock:
+            if self.built_at is None:
+                # Not built yet, the first rebuild will pick the agent up
+                return
+            self._remove(agent["agent_id"])
+            self._add(dict(agent))
+
+    def remove(self, agent_id):
+        with self._lock:
+            self._remove(agent_id)
+
+    def _add(self, agent, keep_sorted=True):
+        agent_id = agent["agent_id"]
+        tokens = agent_tokens(agent)
+        self._agents[agent_id] = agent
+        self._agent_tokens[agent_id] = tokens
+        for token in tokens:
+            agents = self._token_agents[token]
+            if not agents:
+                if keep_sorted:
+                    bisect.insort(self._sorted_tokens, token)
+                if fuzzy_matchable(token):
+                    grams = trigrams(token)
+                    self._token_grams[token] = grams
+                    for gram in grams:
+                        self._trigram_tokens[gram].add(token)
+            agents.add(agent_id)
+
+    def _remove(self, agent_id):
+        if self._agents.pop(agent_id, None) is None:
+            return
+        for token in self._agent_tokens.pop(agent_id):
+            agents = self._token_agents[token]
+            agents.discard(agent_id)
+            if agents:
+                continue
+            del self._token_agents[token]
+            del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+            for gram in self._token_grams.pop(token, ()):
+                tokens = self._trigram_tokens[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigram_tokens[gram]
+
+    def _fuzzy_tokens(self, term):
+        """Tokens whose trigram similarity to term reaches FUZZY_THRESHOLD."""
+        query_grams = trigrams(term)
+        # similarity >= t needs at least ceil(t * |query grams|) shared grams, so every
+        # match has one of the rarest len - min_shared + 1 grams and common grams
+        # like "  s" never have to be scanned
+        min_shared = max(1, math.ceil(FUZZY_THRESHOLD * len(query_grams)))
+        by_rarity = sorted(query_grams, key=lambda gram: len(self._trigram_tokens.get(gram, ())))
+        candidates = set()
+        for gram in by_rarity[: len(by_rarity) - min_shared + 1]:
+            candidates.update(self._trigram_tokens.get(gram, ()))
+
+        matches = {}
+        for token in candidates:
+            grams = self._token_grams[token]
+            shared = len(query_grams & grams)
+            similarity = shared / (len(query_grams) + len(grams) - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token] = FUZZY_WEIGHT * similarity
+        return matches
+
+    def _term_tokens(self, term, enough=None):
+        """Matching tokens for one query term, {token: score}, in token order.
+
+        With enough set, stop once the prefix matches cover that many agents.
+        """
+        # Exact and prefix matches are the slice of the sorted token list starting with term
+        sorted_tokens = self._sorted_tokens
+        start = bisect.bisect_left(sorted_tokens, term)
+        end = bisect.bisect_left(sorted_tokens, term[:-1] + chr(ord(term[-1]) + 1), start)
+        if enough is not None:
+            covered = set()
+            for i in range(start, end):
+                if len(covered) >= enough:
+                    end = i
+                    break
+                covered.update(self._token_agents[sorted_tokens[i]])
+        token_scores = dict.fromkeys(sorted_tokens[start:end], PREFIX_SCORE)
+        if term in token_scores:
+            token_scores[term] = EXACT_SCORE
+
+        # Typo tolerance as a fallback for terms nothing starts with; one or two
+        # letters have too few trigrams to compare
+        if not token_scores and len(term) >= 3 and fuzzy_matchable(term):
+            for token, score in sorted(self._fuzzy_tokens(term).items()):
+                token_scores[token] = score
+        return token_scores
+
+    def search(self, query, limit=20, active_only=False):
+        """Return [(agent, score)] best first."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            agents = self._agents
+            if len(terms) == 1:
+                # Ties are ordered by the matched token, so the prefix scan can stop
+                # once the first tokens cover limit agents (more when filtering)
+                term_tokens = [self._term_tokens(terms[0], enough=None if active_only else limit)]
+            else:
+                term_tokens = [self._term_tokens(term) for term in terms]
+
+            # Agents matching every term, intersecting the smallest sets first
+            matching = sorted(
+                (set().union(*(self._token_agents[token] for token in token_scores)) for token_scores in term_tokens),
+                key=len,
+            )
+            candidates = matching[0].intersection(*matching[1:])
+            if active_only:
+                candidates = {agent_id for agent_id in candidates if agents[agent_id].get("active_status")}
+
+            totals = {}
+            for agent_id in candidates:
+                tokens = self._agent_tokens[agent_id]
+                score = 0
+                matched = []
+                for token_scores in term_tokens:
+                    # Highest score, then alphabetically first token, among the agent's matches
+                    best = min((-token_scores[token], token) for token in tokens if token in token_scores)
+                    score -= best[0]
+                    matched.append(best[1])
+                totals[agent_id] = (score, tuple(matched))
+
+            def rank(agent_id):
+                score, tokens = totals[agent_id]
+                agent = agents[agent_id]
+                return (-score, tokens, normalize(agent.get("last_name")), normalize(agent.get("first_name")), agent_id)
+
+            best = heapq.nsmallest(limit, totals, key=rank)
+            return [(agents[agent_id], round(totals[agent_id][0] / len(terms), 4)) for agent_id in best]
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# app reads its database location at import time, so this runs before any test imports it
+os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test")
+
+
+@pytest.fixture
+def backend():
+    """The app module with empty tables, inside an app context."""
+    import app as backend
+
+    with backend.app.app_context():
+        backend.db.session.remove()
+        backend.db.drop_all()
+        backend.db.create_all()
+        # Cache keys carry versions that restart with the tables
+        backend.schedule_cache.clear()
+        backend.roster_cache.clear()
+        backend.invalidate_agent_id_cache()
+        yield backend
+        backend.db.session.remove()
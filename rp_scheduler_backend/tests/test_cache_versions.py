@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+MONDAY = date(2024, 1, 1)
+ROSTER_URL = "/api/availability/roster?start=2024-01-01&end=2024-01-07"
+
+
+@pytest.fixture
+def client(backend):
+    for agent_id in range(1, 5):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.commit()
+    backend.apply_availability_updates({agent_id: ({day: True for day in range(7)}, {}) for agent_id in range(1, 5)})
+    backend.db.session.commit()
+    backend.save_schedules([(MONDAY, [(1, 2), (3, 4)], [])])
+    backend.register_user("scheduler", "secret")
+    client = backend.app.test_client()
+    assert client.post("/api/login", json={"username": "scheduler", "password": "secret"}).status_code == 200
+    return client
+
+
+def versions(backend):
+    return backend.cache_versions(backend.ROSTER_VERSION, backend.AVAILABILITY_VERSION)
+
+
+def cached_schedule_version(backend):
+    return backend.schedule_cache.get(MONDAY.isoformat())["roster_version"]
+
+
+def test_availability_edits_keep_the_schedule_cache(backend, client):
+    schedule = client.get("/api/schedule/get?date=2024-01-01")
+    roster = client.get(ROSTER_URL)
+    roster_version, availability_version = versions(backend)
+
+    weekdays = {"weeklyAvailability": [1, 2, 3, 4, 5], "specificDates": {}}
+    assert client.put("/api/agents/availability/update/1", json=weekdays).status_code == 200
+    assert versions(backend) == (roster_version, availability_version + 1)
+
+    # The schedule is still served from the entry cached before the edit
+    assert cached_schedule_version(backend) == roster_version
+    assert client.get("/api/schedule/get?date=2024-01-01", headers={"If-None-Match": schedule.headers["ETag"]}).status_code == 304
+    # The grid is rebuilt with the new availability
+    edited = client.get(ROSTER_URL, headers={"If-None-Match": roster.headers["ETag"]})
+    assert edited.status_code == 200
+    assert edited.get_json()["availability"][0] == "1111100"
+
+
+def test_active_status_changes_only_the_availability_version(backend, client):
+    roster_version, availability_version = versions(backend)
+    assert client.put("/api/agents/update/4", json={"active_status": False}).status_code == 200
+    assert versions(backend) == (roster_version, availability_version + 1)
+    assert client.get(ROSTER_URL).get_json()["agent_ids"] == [1, 2, 3]
+
+    # Contact details change neither
+    assert client.put("/api/agents/update/3", json={"email": "three@example.com"}).status_code == 200
+    assert versions(backend) == (roster_version, availability_version + 1)
+
+
+def test_rename_changes_the_roster_version(backend, client):
+    assert client.get("/api/schedule/get?date=2024-01-01").status_code == 200
+    roster = client.get(ROSTER_URL)
+    roster_version, availability_version = versions(backend)
+
+    assert client.put("/api/agents/update/1", json={"first_name": "Renamed"}).status_code == 200
+    assert versions(backend) == (roster_version + 1, availability_version)
+    assert "Renamed Last1" in {detail["agent1_name"] for detail in client.get("/api/schedule/get?date=2024-01-01").get_json()["details"]}
+    # The grid keys on both versions, so its ETag changes as well
+    assert client.get(ROSTER_URL, headers={"If-None-Match": roster.headers["ETag"]}).status_code == 200
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+
+WEEK1 = date(2024, 1, 1)
+WEEK2 = date(2024, 1, 8)
+
+
+@pytest.fixture
+def roster(backend):
+    for agent_id in range(1, 7):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.add(backend.Blacklist(agent1_id=1, agent2_id=4))
+    backend.db.session.commit()
+    backend.apply_availability_updates({agent_id: ({day: True for day in range(7)}, {WEEK1: False}) for agent_id in range(1, 7)})
+    backend.db.session.commit()
+    # Agent 1 appears as agent1 and agent 3 as agent2; in week 2 they are paired with each other
+    backend.save_schedules([(WEEK1, [(1, 2), (4, 3)], [5]), (WEEK2, [(1, 3), (2, 4)], [6])])
+    return backend
+
+
+@pytest.fixture
+def client(roster):
+    roster.register_user("scheduler", "secret")
+    client = roster.app.test_client()
+    assert client.post("/api/login", json={"username": "scheduler", "password": "secret"}).status_code == 200
+    return client
+
+
+def schedule_details(backend, monday):
+    schedule = backend.Schedule.query.filter_by(date=monday).one()
+    return {
+        (detail.agent1_id, detail.agent2_id, detail.is_paired)
+        for detail in backend.ScheduleDetail.query.filter_by(schedule_id=schedule.schedule_id)
+    }
+
+
+def rows_referring_to(backend, agent_ids):
+    return {
+        "weekly_availability": backend.WeeklyAvailability.query.filter(backend.WeeklyAvailability.agent_id.in_(agent_ids)).count(),
+        "availability_overrides": backend.AvailabilityOverride.query.filter(backend.AvailabilityOverride.agent_id.in_(agent_ids)).count(),
+        "blacklist": backend.Blacklist.query.filter(
+            backend.Blacklist.agent1_id.in_(agent_ids) | backend.Blacklist.agent2_id.in_(agent_ids)
+        ).count(),
+        "pairing_history": backend.PairingHistory.query.filter(
+            backend.PairingHistory.agent1_id.in_(agent_ids) | backend.PairingHistory.agent2_id.in_(agent_ids)
+        ).count(),
+        "agents": backend.Agent.query.filter(backend.Agent.agent_id.in_(agent_ids)).count(),
+    }
+
+
+def test_delete_agent_unpairs_the_partner(roster, client):
+    assert client.delete("/api/agents/delete/1").status_code == 200
+
+    assert schedule_details(roster, WEEK1) == {(2, None, False), (4, 3, True), (5, None, False)}
+    assert schedule_details(roster, WEEK2) == {(3, None, False), (2, 4, True), (6, None, False)}
+    assert set(rows_referring_to(roster, [1]).values()) == {0}
+    # The partners keep their own rows
+    assert rows_referring_to(roster, [2, 3, 4]) == {
+        "weekly_availability": 3,
+        "availability_overrides": 3,
+        "blacklist": 0,
+        "pairing_history": 2,
+        "agents": 3,
+    }
+
+
+def test_bulk_delete_drops_details_left_without_an_agent(roster, client):
+    response = client.delete("/api/agents/bulk_delete", json={"agent_ids": [1, 3, 5]})
+    assert response.status_code == 200
+    steps = {step["step"]: step["rows"] for step in response.get_json()["steps"]}
+    assert steps["unpair_schedule_details"] == 3
+    assert steps["agents"] == 3
+
+    # (4, 3) keeps agent 4, (1, 3) loses both agents and 5 was unpaired on its own
+    assert schedule_details(roster, WEEK1) == {(2, None, False), (4, None, False)}
+    assert schedule_details(roster, WEEK2) == {(2, 4, True), (6, None, False)}
+    assert set(rows_referring_to(roster, [1, 3, 5]).values()) == {0}
+    assert roster.PairingHistory.query.count() == 1
+
+
+def test_bulk_delete_rejects_unknown_ids(roster, client):
+    response = client.delete("/api/agents/bulk_delete", json={"agent_ids": [1, 99]})
+    assert response.status_code == 400
+    assert response.get_json()["agent_ids"] == [99]
+    assert roster.Agent.query.count() == 6
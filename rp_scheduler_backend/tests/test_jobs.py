@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def release(backend):
+    # Jobs block until the test sets this, so they stay active while it submits again
+    event = threading.Event()
+    yield event
+    event.set()
+    backend.job_queue.shutdown()
+
+
+@pytest.fixture
+def queue(backend, release):
+    queue = JobQueue(backend.app, backend.db, backend.ScheduleJob, workers=1)
+    queue.handler("wait")(lambda value: release.wait(5) and value)
+    yield queue
+    release.set()
+    queue.shutdown()
+
+
+@pytest.fixture
+def client(backend, release, monkeypatch):
+    monkeypatch.setitem(backend.job_queue._handlers, "generate_schedule", lambda **params: release.wait(5))
+    backend.register_user("scheduler", "secret")
+    client = backend.app.test_client()
+    assert client.post("/api/login", json={"username": "scheduler", "password": "secret"}).status_code == 200
+    return client
+
+
+def add_job(backend, key, status, started_at):
+    job = backend.ScheduleJob(kind="wait", active_key=key, params='{"value": 1}', status=status, created_at=started_at, started_at=started_at)
+    backend.db.session.add(job)
+    backend.db.session.commit()
+    return job
+
+
+def test_second_submit_returns_the_active_job(backend, queue, release):
+    job, created = queue.submit("wait", "wait:1", {"value": 1})
+    again, created_again = queue.submit("wait", "wait:1", {"value": 1})
+    assert created and not created_again
+    assert again.job_id == job.job_id
+
+    other, created_other = queue.submit("wait", "wait:2", {"value": 2})
+    assert created_other and other.job_id != job.job_id
+
+    release.set()
+    queue.shutdown()
+    backend.db.session.expire_all()
+    assert queue.get(job.job_id).status == SUCCEEDED
+    assert queue.get(job.job_id).active_key is None
+    # Finished jobs no longer hold the key
+    assert queue.submit("wait", "wait:1", {"value": 1})[1]
+
+
+def test_stale_job_is_failed_and_replaced(backend, queue):
+    stale = add_job(backend, "wait:1", RUNNING, datetime.utcnow() - queue.stale_after - timedelta(minutes=1))
+    job, created = queue.submit("wait", "wait:1", {"value": 1})
+    assert created and job.job_id != stale.job_id
+
+    backend.db.session.expire_all()
+    stale = queue.get(stale.job_id)
+    assert (stale.status, stale.error, stale.active_key) == (FAILED, "Abandoned", None)
+    assert queue.active_job("wait:1").job_id == job.job_id
+
+
+def test_recent_job_is_not_stale(backend, queue):
+    recent = add_job(backend, "wait:1", QUEUED, datetime.utcnow() - queue.stale_after + timedelta(minutes=1))
+    job, created = queue.submit("wait", "wait:1", {"value": 1})
+    assert not created and job.job_id == recent.job_id
+
+
+def test_get_schedule_for_a_missing_week_shares_one_job(backend, client):
+    first = client.get("/api/schedule/get?date=2024-01-01")
+    second = client.get("/api/schedule/get?date=2024-01-01")
+    assert first.status_code == second.status_code == 202
+    assert first.get_json()["job"]["job_id"] == second.get_json()["job"]["job_id"]
+    assert second.get_json()["message"] == "Already queued"
+    assert second.headers["Location"] == f"/api/jobs/{first.get_json()['job']['job_id']}"
+
+    # Other weeks get their own job
+    assert client.get("/api/schedule/get?date=2024-01-08").get_json()["job"]["job_id"] != first.get_json()["job"]["job_id"]
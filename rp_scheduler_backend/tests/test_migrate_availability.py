@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import Boolean, Column, Date, Integer, MetaData, String, Table, inspect
+
+START = date(2024, 2, 26)
+DAYS = 42
+
+RECURRING = [
+    # Agent 1: weekdays, with a second Monday row that the first one shadows
+    *[(1, str(day), day in range(1, 6)) for day in range(7)],
+    (1, "1", False),
+    # Agent 2: only Tuesdays and Saturdays are set, the other days have no row
+    (2, "2", True),
+    (2, "6", True),
+    # Agent 99 does not exist any more
+    (99, "1", True),
+]
+SPECIFIC = [
+    (1, date(2024, 3, 4), False),
+    (1, date(2024, 3, 4), True),
+    (1, date(2024, 3, 9), True),
+    (2, date(2024, 3, 5), False),
+    (2, date(2024, 4, 1), True),
+    # Agent 3 only has specific dates
+    (3, date(2024, 2, 29), True),
+    (3, date(2024, 3, 31), True),
+]
+
+
+@pytest.fixture
+def legacy(backend):
+    for agent_id in range(1, 5):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.commit()
+
+    # As in the dump: day_of_week is a string and neither table has a unique key
+    metadata = MetaData()
+    recurring = Table(
+        "recurring_availability",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("agent_id", Integer),
+        Column("day_of_week", String(10)),
+        Column("is_available", Boolean),
+    )
+    specific = Table(
+        "availability",
+        metadata,
+        Column("availability_id", Integer, primary_key=True),
+        Column("agent_id", Integer),
+        Column("date", Date),
+        Column("is_available", Boolean),
+    )
+    metadata.create_all(backend.db.engine)
+    with backend.db.engine.begin() as connection:
+        connection.execute(recurring.insert(), [{"agent_id": a, "day_of_week": d, "is_available": v} for a, d, v in RECURRING])
+        connection.execute(specific.insert(), [{"agent_id": a, "date": d, "is_available": v} for a, d, v in SPECIFIC])
+    yield backend
+    metadata.drop_all(backend.db.engine, checkfirst=True)
+
+
+def legacy_is_available(agent_id, day):
+    # The lookup the legacy tables were read with: the first specific row, then the
+    # first recurring row for the weekday (Sunday is 0), otherwise unavailable
+    for row_agent_id, row_date, is_available in SPECIFIC:
+        if (row_agent_id, row_date) == (agent_id, day):
+            return is_available
+    for row_agent_id, day_of_week, is_available in RECURRING:
+        if (row_agent_id, int(day_of_week)) == (agent_id, day.isoweekday() % 7):
+            return is_available
+    return False
+
+
+def migrate(backend, *args):
+    result = backend.app.test_cli_runner().invoke(args=["migrate-availability", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_migration_keeps_what_the_legacy_rows_said(legacy):
+    migrate(legacy)
+
+    dates = [START + timedelta(days=offset) for offset in range(DAYS)]
+    for agent_id in range(1, 5):
+        assert legacy.agent_available_on(agent_id, dates) == {day: legacy_is_available(agent_id, day) for day in dates}, agent_id
+    assert legacy.WeeklyAvailability.query.filter_by(agent_id=99).count() == 0
+
+
+def test_migration_can_run_again_and_drop_the_legacy_tables(legacy):
+    migrate(legacy)
+    masks = {row.agent_id: row.day_mask for row in legacy.WeeklyAvailability.query}
+    overrides = {(row.agent_id, row.month): (row.override_mask, row.available_mask) for row in legacy.AvailabilityOverride.query}
+
+    assert "{'agents': 3, 'inserted': 0, 'updated': 0, 'deleted': 0}" in migrate(legacy, "--drop-legacy")
+    legacy.db.session.expire_all()
+    assert {row.agent_id: row.day_mask for row in legacy.WeeklyAvailability.query} == masks
+    assert {(row.agent_id, row.month): (row.override_mask, row.available_mask) for row in legacy.AvailabilityOverride.query} == overrides
+    assert not {"recurring_availability", "availability"} & set(inspect(legacy.db.engine).get_table_names())
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+import pytest
+
+from pairing import NEVER_PAIRED_WEIGHT, PairRecency
+
+MATCHINGS = [{(1, 2), (3, 4)}, {(1, 3), (2, 4)}, {(1, 4), (2, 3)}]
+
+
+def normalized(pairings):
+    return {(min(pair), max(pair)) for pair in pairings}
+
+
+@pytest.fixture
+def roster(backend):
+    for agent_id in range(1, 5):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.commit()
+    backend.apply_availability_updates({agent_id: ({day: True for day in range(7)}, {}) for agent_id in range(1, 5)})
+    backend.db.session.commit()
+    return backend
+
+
+def test_weeks_apart_counts_pairings_on_both_sides():
+    recency = PairRecency([1, 2, 3], [(1, 2, date(2024, 1, 1))], [(1, 2, date(2024, 1, 29)), (2, 3, date(2024, 1, 22))])
+    monday = date(2024, 1, 15)
+    assert recency.weeks_apart(monday, [(1, 2), (2, 3), (1, 3)]).tolist() == [2, 1, NEVER_PAIRED_WEIGHT]
+    recency.record([(1, 3)], monday)
+    assert recency.weeks_apart(monday + timedelta(weeks=3), [(3, 1)]).tolist() == [3]
+
+
+@pytest.mark.parametrize("solver", ["greedy", "blossom", "weighted"])
+def test_regenerating_a_week_avoids_the_following_week(roster, solver):
+    roster.save_schedules([(date(2024, 1, 8), [(1, 2), (3, 4)], [])])
+    pairings, unpaired, _ = roster.create_schedule(date(2024, 1, 1), solver, mode="recency")
+    assert not unpaired
+    assert normalized(pairings) != {(1, 2), (3, 4)}
+
+
+@pytest.mark.parametrize("solver", ["greedy", "blossom", "weighted"])
+def test_regenerating_the_middle_of_a_range_avoids_its_neighbours(roster, solver):
+    roster.save_schedules([(date(2024, 1, 1), MATCHINGS[0], []), (date(2024, 1, 8), MATCHINGS[0], []), (date(2024, 1, 15), MATCHINGS[1], [])])
+    pairings, unpaired, _ = roster.create_schedule(date(2024, 1, 8), solver, mode="recency")
+    assert not unpaired
+    assert normalized(pairings) == MATCHINGS[2]
@@ -0,0 +1,94 @@
+import random
+import time
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from pairing import SOLVERS, blossom_matching, greedy_matching, solve_pairing
+
+
+def random_graph(seed, max_agents=40):
+    rng = random.Random(seed)
+    n = rng.randrange(max_agents)
+    agent_ids = rng.sample(range(1, 1000), n)
+    adjacency = np.zeros((n, n), dtype=bool)
+    density = rng.random() * 0.3
+    for i in range(n):
+        for j in range(i + 1, n):
+            adjacency[i, j] = adjacency[j, i] = rng.random() < density
+    return agent_ids, adjacency
+
+
+def maximum_matching_size(agent_ids, adjacency):
+    graph = nx.Graph()
+    graph.add_nodes_from(agent_ids)
+    rows, cols = np.nonzero(np.triu(adjacency, k=1))
+    graph.add_edges_from((agent_ids[i], agent_ids[j]) for i, j in zip(rows.tolist(), cols.tolist()))
+    return len(nx.max_weight_matching(graph, maxcardinality=True))
+
+
+def assert_valid(agent_ids, adjacency, pairings, unpaired):
+    index = {agent_id: i for i, agent_id in enumerate(agent_ids)}
+    paired = [agent_id for pair in pairings for agent_id in pair]
+    assert len(paired) == len(set(paired))
+    assert set(paired) | set(unpaired) == set(agent_ids)
+    assert not set(paired) & set(unpaired)
+    assert all(adjacency[index[agent1_id], index[agent2_id]] for agent1_id, agent2_id in pairings)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_blossom_and_weighted_find_a_maximum_matching(seed):
+    agent_ids, adjacency = random_graph(seed)
+    expected = maximum_matching_size(agent_ids, adjacency)
+    for solver in ("blossom", "weighted"):
+        result = solve_pairing(agent_ids, adjacency, solver)
+        assert_valid(agent_ids, adjacency, result.pairings, result.unmatched)
+        assert len(result.pairings) == expected
+        assert result.complete
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_greedy_matching_is_valid_and_maximal(seed):
+    agent_ids, adjacency = random_graph(seed)
+    pairings, unpaired = greedy_matching(agent_ids, adjacency, random.Random(seed))
+    assert_valid(agent_ids, adjacency, pairings, unpaired)
+    # No two unpaired agents could still have been paired
+    left = [agent_ids.index(agent_id) for agent_id in unpaired]
+    assert not adjacency[np.ix_(left, left)].any()
+
+
+def test_greedy_pairs_the_most_constrained_agent_first():
+    # 4 can only go with 1; pairing 1 with 2 first would strand 4
+    adjacency = np.zeros((4, 4), dtype=bool)
+    for i, j in [(0, 1), (0, 2), (0, 3), (1, 2)]:
+        adjacency[i, j] = adjacency[j, i] = True
+    pairings, unpaired = greedy_matching([1, 2, 3, 4], adjacency)
+    assert {frozenset(pair) for pair in pairings} == {frozenset((1, 4)), frozenset((2, 3))}
+    assert not unpaired
+
+
+def test_blossom_grows_an_augmenting_path_through_an_odd_cycle():
+    # A triangle 1-2-3 with tails 0-1 and 3-4; starting from (1, 2) leaves 0, 3 and 4
+    agent_ids = [0, 1, 2, 3, 4, 5]
+    adjacency = np.zeros((6, 6), dtype=bool)
+    for i, j in [(0, 1), (1, 2), (2, 3), (3, 1), (3, 4), (4, 5)]:
+        adjacency[i, j] = adjacency[j, i] = True
+    pairings, unpaired, complete = blossom_matching(agent_ids, adjacency, [(1, 2)])
+    assert len(pairings) == 3 and not unpaired and complete
+
+
+def test_blossom_stops_at_the_deadline_with_a_valid_matching():
+    agent_ids, adjacency = random_graph(7, max_agents=60)
+    assert adjacency.any()
+    initial = greedy_matching(agent_ids, adjacency)[0][:1]
+    pairings, unpaired, complete = blossom_matching(agent_ids, adjacency, initial, deadline=time.perf_counter() - 1)
+    assert_valid(agent_ids, adjacency, pairings, unpaired)
+    assert not complete
+    assert {frozenset(pair) for pair in pairings} == {frozenset(pair) for pair in initial}
+
+
+def test_unknown_solver_is_rejected():
+    assert "greedy" in SOLVERS
+    with pytest.raises(ValueError):
+        solve_pairing([], np.zeros((0, 0), dtype=bool), "simplex")
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, Table, inspect
+
+DUPLICATED = date(2024, 3, 12)
+
+
+@pytest.fixture
+def dump(backend):
+    """Tables as in the shipped dump: schedules without an index on date, two schedules for one week."""
+    for agent_id in range(1, 5):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.commit()
+
+    backend.Schedule.__table__.drop(backend.db.engine)
+    schedules = Table(
+        "schedules",
+        MetaData(),
+        Column("schedule_id", Integer, primary_key=True),
+        Column("date", Date),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+    )
+    schedules.create(backend.db.engine)
+    with backend.db.engine.begin() as connection:
+        connection.execute(schedules.insert(), [{"schedule_id": 7, "date": date(2024, 2, 12)}, {"schedule_id": 80, "date": DUPLICATED}, {"schedule_id": 81, "date": DUPLICATED}])
+    details = [(7, 1, 2, True), (7, 3, 4, True), (80, 1, 3, True), (80, 2, 4, True), (81, 1, 4, True), (81, 2, None, False), (81, 3, None, False)]
+    backend.db.session.execute(
+        backend.insert(backend.ScheduleDetail),
+        [{"schedule_id": s, "agent1_id": a, "agent2_id": b, "is_paired": p} for s, a, b, p in details],
+    )
+    backend.db.session.commit()
+    return backend
+
+
+def run(backend, command):
+    result = backend.app.test_cli_runner().invoke(args=[command])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def schedules_date_is_unique(backend):
+    indexes = inspect(backend.db.engine).get_indexes("schedules")
+    return any(index["name"] == "ix_schedules_date" and index["unique"] for index in indexes)
+
+
+def history(backend):
+    return {(row.agent1_id, row.agent2_id, row.paired_date) for row in backend.PairingHistory.query}
+
+
+def test_backfill_runs_on_duplicate_weeks(dump):
+    assert "Rebuilt pairing_history with 5 rows" in run(dump, "backfill-pairing-history")
+    assert not schedules_date_is_unique(dump)
+
+    assert "Removed duplicate schedules for 1 weeks: 2024-03-12" in run(dump, "dedupe-schedules")
+    assert schedules_date_is_unique(dump)
+    assert [schedule.schedule_id for schedule in dump.Schedule.query.order_by(dump.Schedule.schedule_id)] == [7, 81]
+    assert history(dump) == {(1, 2, date(2024, 2, 12)), (3, 4, date(2024, 2, 12)), (1, 4, DUPLICATED)}
+
+
+def test_dedupe_then_backfill(dump):
+    run(dump, "dedupe-schedules")
+    assert "Rebuilt pairing_history with 3 rows" in run(dump, "backfill-pairing-history")
+    assert schedules_date_is_unique(dump)
+    assert dump.ScheduleDetail.query.filter_by(schedule_id=80).count() == 0
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def client(backend):
+    for agent_id in range(1, 5):
+        backend.db.session.add(backend.Agent(agent_id=agent_id, first_name=f"First{agent_id}", last_name=f"Last{agent_id}", active_status=True))
+    backend.db.session.commit()
+    backend.register_user("scheduler", "secret")
+    client = backend.app.test_client()
+    assert client.post("/api/login", json={"username": "scheduler", "password": "secret"}).status_code == 200
+    return client
+
+
+def saved_pairs(backend, monday):
+    schedule = backend.Schedule.query.filter_by(date=monday).one()
+    return {
+        (detail.agent1_id, detail.agent2_id)
+        for detail in backend.ScheduleDetail.query.filter_by(schedule_id=schedule.schedule_id, is_paired=True)
+    }
+
+
+def test_unknown_agent_ids_are_rejected(backend, client):
+    response = client.post("/api/schedule/set", json={"date": "2024-01-01", "details": [{"agent1_id": 1, "agent2_id": 99}], "unpaired": [{"agent_id": 98}]})
+    assert response.status_code == 400
+    assert response.get_json()["agent_ids"] == [98, 99]
+    assert backend.Schedule.query.count() == 0
+
+
+def test_non_integer_agent_ids_are_rejected(backend, client):
+    response = client.post("/api/schedule/set", json={"date": "2024-01-01", "details": [{"agent1_id": "one", "agent2_id": 2}]})
+    assert response.status_code == 400
+    assert backend.Schedule.query.count() == 0
+
+
+def test_names_follow_a_rename_made_by_another_worker(backend, client):
+    details = [{"agent1_name": "First1 Last1", "agent2_name": "First2 Last2"}]
+    assert client.post("/api/schedule/set", json={"date": "2024-01-01", "details": details}).status_code == 200
+    assert saved_pairs(backend, date(2024, 1, 1)) == {(1, 2)}
+
+    # Another worker swaps the names of agents 1 and 3; this worker's cache is not cleared directly
+    backend.Agent.query.filter_by(agent_id=1).update({"first_name": "Tmp", "last_name": "Tmp"})
+    backend.Agent.query.filter_by(agent_id=3).update({"first_name": "First1", "last_name": "Last1"})
+    backend.Agent.query.filter_by(agent_id=1).update({"first_name": "First3", "last_name": "Last3"})
+    backend.bump_cache_version(backend.ROSTER_VERSION)
+    backend.db.session.commit()
+
+    assert client.post("/api/schedule/set", json={"date": "2024-01-01", "details": details}).status_code == 200
+    assert saved_pairs(backend, date(2024, 1, 1)) == {(3, 2)}
@@ -1,29 +1,74 @@
 import React, { useState, useEffect } from "react";
 
+// Stop waiting for a generation job after this long; a job whose worker died
+// stays "running" until the backend gives up on it much later
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
 function ScheduleViewer() {
   const [schedule, setSchedule] = useState(null);
   const [currentWeek, setCurrentWeek] = useState(getMonday(new Date()));
   const [editedSchedule, setEditedSchedule] = useState({ details: [], unpaired: [] });
   const [isEditing, setIsEditing] = useState(false);
+  const [error, setError] = useState(null);
 
   useEffect(() => {
     // Fetch schedules from the backend
     fetchSchedule();
   }, [currentWeek]);
 
+  // Generation runs as a background job; resolves once it has finished
+  const waitForJob = async (jobId, deadline = Date.now() + JOB_POLL_TIMEOUT_MS) => {
+    for (;;) {
+      const response = await fetch(`/api/jobs/${jobId}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const job = await response.json();
+      if (job.status === "succeeded") {
+        return job;
+      }
+      if (job.status === "failed") {
+        throw new Error(`Schedule generation failed: ${job.error}`);
+      }
+      if (Date.now() >= deadline) {
+        throw new Error("Schedule generation is taking too long. Please try again later.");
+      }
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  };
+
   const fetchSchedule = async () => {
     const formattedDate = currentWeek.toISOString().split("T")[0];
 
+    setError(null);
     try {
-      const response = await fetch(`/api/schedule/get?date=${formattedDate}`);
-      if(!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}. You may need to login again.`);
+      const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+      let data;
+      for (let attempt = 0; ; attempt++) {
+        const response = await fetch(`/api/schedule/get?date=${formattedDate}`);
+        if(!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}. You may need to login again.`);
+        }
+        data = await response.json();
+        // The week can still answer with a job after one finished (another request
+        // queued it again, say), so only a body without a job is a schedule
+        if (response.status !== 202 && !data.job) {
+          break;
+        }
+        if (attempt > 0) {
+          if (Date.now() >= deadline) {
+            throw new Error("Schedule generation is taking too long. Please try again later.");
+          }
+          await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        }
+        await waitForJob(data.job.job_id, deadline);
       }
-      const data = await response.json();
       setSchedule(data);
       setEditedSchedule({ details: data.details, unpaired: data.unpaired });
     } catch (error) {
       console.error("Error fetching schedule: ", error);
+      setError(error.message);
     }
   };
 
@@ -37,6 +82,7 @@ function ScheduleViewer() {
 
   const regenerateSchedule = async () => {
     const formattedDate = currentWeek.toISOString().split("T")[0];
+    setError(null);
     try {
       const response = await fetch(
         `api/schedule/generate?date=${formattedDate}`,
@@ -45,9 +91,12 @@ function ScheduleViewer() {
       if (!response.ok) {
         throw new Error("Error regenerating schedule");
       }
+      const { job } = await response.json();
+      await waitForJob(job.job_id);
       fetchSchedule();
     } catch (error) {
       console.error("Error regenerating schedule:", error);
+      setError(error.message);
     }
   };
 
@@ -306,6 +355,7 @@ function ScheduleViewer() {
       ) : (
         <button onClick={() => setIsEditing(true)}>Edit Schedule</button>
       )}
+      {error && <p>{error}</p>}
       {schedule ? (
         <div>
           <h2>Schedule Details</h2>